@@ -0,0 +1,84 @@
+"""added expense rollup and user balance
+
+Revision ID: 5a6f75e8742a
+Revises: e9a39921b5be
+Create Date: 2026-10-18 12:41:27.530114
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5a6f75e8742a"
+down_revision = "e9a39921b5be"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "expenserollup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("spend", sa.Float(), nullable=False),
+        sa.Column("income", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["category_id"], ["expensecategory.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id", "category_id", "month", name="uq_expenserollup_bucket"
+        ),
+    )
+    op.create_table(
+        "userbalance",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("spend", sa.Float(), nullable=False),
+        sa.Column("income", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO expenserollup (user_id, category_id, month, spend, income, count)
+        SELECT created_by_id, category_id,
+               date_trunc('month', coalesce(payment_date, created_at))::date,
+               sum(CASE WHEN is_spend THEN -amount ELSE 0 END),
+               sum(CASE WHEN is_spend THEN 0 ELSE amount END),
+               count(*)
+        FROM expense
+        WHERE created_by_id IS NOT NULL AND category_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO userbalance (user_id, spend, income, count)
+        SELECT created_by_id,
+               sum(CASE WHEN is_spend THEN -amount ELSE 0 END),
+               sum(CASE WHEN is_spend THEN 0 ELSE amount END),
+               count(*)
+        FROM expense
+        WHERE created_by_id IS NOT NULL
+        GROUP BY 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("userbalance")
+    op.drop_table("expenserollup")
@@ -0,0 +1,94 @@
+"""added group expense and expense split
+
+Revision ID: 754996fc32b5
+Revises: 5a6f75e8742a
+Create Date: 2026-10-18 12:52:10.482913
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "754996fc32b5"
+down_revision = "5a6f75e8742a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "groupexpense",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("paid_by_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "split_type",
+            sa.Enum("equal", "exact", "percentage", name="splittypeenum"),
+            nullable=False,
+        ),
+        sa.Column("payment_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_by_id", sa.Integer(), nullable=True),
+        sa.Column("updated_by_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["created_by_id"],
+            ["user.id"],
+            name="fk_GroupExpense_created_by_id",
+            use_alter=True,
+        ),
+        sa.ForeignKeyConstraint(["group_id"], ["expensegroup.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["paid_by_id"],
+            ["user.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["updated_by_id"],
+            ["user.id"],
+            name="fk_GroupExpense_updated_by_id",
+            use_alter=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_groupexpense_group_id_payment_date",
+        "groupexpense",
+        ["group_id", "payment_date"],
+    )
+    op.create_table(
+        "expensesplit",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("group_expense_id", sa.Integer(), nullable=False),
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("share", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["group_expense_id"], ["groupexpense.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["group_id"], ["expensegroup.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "group_expense_id", "user_id", name="uq_expensesplit_expense_user"
+        ),
+    )
+    op.create_index(
+        "ix_expensesplit_group_id_user_id",
+        "expensesplit",
+        ["group_id", "user_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expensesplit_group_id_user_id", table_name="expensesplit")
+    op.drop_table("expensesplit")
+    op.drop_index("ix_groupexpense_group_id_payment_date", table_name="groupexpense")
+    op.drop_table("groupexpense")
+    sa.Enum(name="splittypeenum").drop(op.get_bind(), checkfirst=True)
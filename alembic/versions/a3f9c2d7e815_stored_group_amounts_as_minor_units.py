@@ -0,0 +1,71 @@
+"""stored group amounts as minor units
+
+Revision ID: a3f9c2d7e815
+Revises: f2c8a6e41b07
+Create Date: 2026-10-18 16:05:33.270918
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from app import money
+
+# revision identifiers, used by Alembic.
+revision = "a3f9c2d7e815"
+down_revision = "f2c8a6e41b07"
+branch_labels = None
+depends_on = None
+
+# (table, float column, minor unit column); all in the group's currency.
+MONEY_COLUMNS = (
+    ("groupexpense", "amount", "amount_minor"),
+    ("expensesplit", "amount", "amount_minor"),
+    ("balanceentry", "amount", "amount"),
+    ("pairbalance", "balance", "balance"),
+    ("groupmemberbalance", "paid", "paid"),
+    ("groupmemberbalance", "owed", "owed"),
+    ("pairbalancesnapshot", "balance", "balance"),
+)
+
+expensegroup = sa.table("expensegroup", sa.column("id"), sa.column("currency"))
+
+
+def _convert(table, source, target, type_, value):
+    """Replace column `source` of `table` with `target` of `type_`, set to `value`."""
+    temporary = target if target != source else "%s_converted" % target
+    op.add_column(table, sa.Column(temporary, type_, nullable=True))
+    rows = sa.table(
+        table, sa.column("group_id"), sa.column(source), sa.column(temporary)
+    )
+    scale = money.scale_expression(expensegroup.c.currency)
+    op.execute(
+        rows.update()
+        .values({temporary: value(rows.c[source], scale)})
+        .where(rows.c.group_id == expensegroup.c.id)
+    )
+    op.alter_column(table, temporary, nullable=False)
+    op.drop_column(table, source)
+    if temporary != target:
+        op.alter_column(table, temporary, new_column_name=target)
+
+
+def upgrade() -> None:
+    for table, amount, amount_minor in MONEY_COLUMNS:
+        _convert(
+            table,
+            amount,
+            amount_minor,
+            sa.BigInteger(),
+            lambda column, scale: sa.func.round(sa.cast(column, sa.Numeric) * scale),
+        )
+
+
+def downgrade() -> None:
+    for table, amount, amount_minor in MONEY_COLUMNS:
+        _convert(
+            table,
+            amount_minor,
+            amount,
+            sa.Float(),
+            lambda column, scale: sa.cast(column, sa.Float) / scale,
+        )
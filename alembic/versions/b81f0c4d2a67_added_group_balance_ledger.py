@@ -0,0 +1,146 @@
+"""added group balance ledger
+
+Revision ID: b81f0c4d2a67
+Revises: 754996fc32b5
+Create Date: 2026-10-18 13:04:51.207316
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b81f0c4d2a67"
+down_revision = "754996fc32b5"
+branch_labels = None
+depends_on = None
+
+
+def _pair_columns():
+    return [
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.Column("user_a_id", sa.Integer(), nullable=False),
+        sa.Column("user_b_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["group_id"], ["expensegroup.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["user_a_id"],
+            ["user.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_b_id"],
+            ["user.id"],
+        ),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "balanceentry",
+        sa.Column("id", sa.Integer(), nullable=False),
+        *_pair_columns(),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("group_expense_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_balanceentry_group_id_user_a_id_user_b_id",
+        "balanceentry",
+        ["group_id", "user_a_id", "user_b_id"],
+    )
+    op.create_table(
+        "pairbalance",
+        sa.Column("id", sa.Integer(), nullable=False),
+        *_pair_columns(),
+        sa.Column("balance", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "group_id", "user_a_id", "user_b_id", name="uq_pairbalance_pair"
+        ),
+    )
+    op.create_index(
+        "ix_pairbalance_group_id_user_b_id",
+        "pairbalance",
+        ["group_id", "user_b_id"],
+    )
+    op.create_table(
+        "groupmemberbalance",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("group_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("paid", sa.Float(), nullable=False),
+        sa.Column("owed", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["group_id"], ["expensegroup.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["user.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("group_id", "user_id", name="uq_groupmemberbalance_member"),
+    )
+    op.create_table(
+        "pairbalancesnapshot",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("last_entry_id", sa.Integer(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(timezone=True), nullable=True),
+        *_pair_columns(),
+        sa.Column("balance", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_pairbalancesnapshot_last_entry_id"),
+        "pairbalancesnapshot",
+        ["last_entry_id"],
+    )
+    op.execute(
+        """
+        INSERT INTO balanceentry
+            (group_id, user_a_id, user_b_id, amount, group_expense_id, created_at)
+        SELECT s.group_id,
+               LEAST(s.user_id, e.paid_by_id),
+               GREATEST(s.user_id, e.paid_by_id),
+               CASE WHEN s.user_id < e.paid_by_id THEN s.amount ELSE -s.amount END,
+               e.id,
+               now()
+        FROM expensesplit s
+        JOIN groupexpense e ON e.id = s.group_expense_id
+        WHERE s.user_id <> e.paid_by_id
+        ORDER BY e.id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO pairbalance (group_id, user_a_id, user_b_id, balance)
+        SELECT group_id, user_a_id, user_b_id, sum(amount)
+        FROM balanceentry
+        GROUP BY 1, 2, 3
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO groupmemberbalance (group_id, user_id, paid, owed)
+        SELECT group_id, user_id, sum(paid), sum(owed)
+        FROM (
+            SELECT group_id, paid_by_id AS user_id, amount AS paid, 0 AS owed
+            FROM groupexpense
+            UNION ALL
+            SELECT group_id, user_id, 0, amount
+            FROM expensesplit
+        ) flows
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_pairbalancesnapshot_last_entry_id"), table_name="pairbalancesnapshot"
+    )
+    op.drop_table("pairbalancesnapshot")
+    op.drop_table("groupmemberbalance")
+    op.drop_index("ix_pairbalance_group_id_user_b_id", table_name="pairbalance")
+    op.drop_table("pairbalance")
+    op.drop_index(
+        "ix_balanceentry_group_id_user_a_id_user_b_id", table_name="balanceentry"
+    )
+    op.drop_table("balanceentry")
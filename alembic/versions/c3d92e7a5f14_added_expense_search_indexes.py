@@ -0,0 +1,37 @@
+"""added expense search indexes
+
+Revision ID: c3d92e7a5f14
+Revises: b81f0c4d2a67
+Create Date: 2026-10-18 13:41:27.583019
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c3d92e7a5f14"
+down_revision = "b81f0c4d2a67"
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = "(coalesce(name, '') || ' ' || coalesce(other_details, ''))"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "ALTER TABLE expense ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('simple', %s)) STORED" % SEARCH_DOCUMENT
+    )
+    op.execute(
+        "CREATE INDEX ix_expense_search_vector ON expense USING gin (search_vector)"
+    )
+    op.execute(
+        "CREATE INDEX ix_expense_search_trgm ON expense USING gin "
+        "(%s gin_trgm_ops)" % SEARCH_DOCUMENT
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expense_search_trgm", table_name="expense")
+    op.drop_index("ix_expense_search_vector", table_name="expense")
+    op.drop_column("expense", "search_vector")
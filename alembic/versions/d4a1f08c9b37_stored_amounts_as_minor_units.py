@@ -0,0 +1,63 @@
+"""stored amounts as minor units
+
+Revision ID: d4a1f08c9b37
+Revises: c3d92e7a5f14
+Create Date: 2026-10-18 14:02:45.116204
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from app import money
+
+# revision identifiers, used by Alembic.
+revision = "d4a1f08c9b37"
+down_revision = "c3d92e7a5f14"
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ("expenserollup", "userbalance")
+# Every amount so far was in the default currency.
+SCALE = 10 ** money.exponent(money.DEFAULT_CURRENCY)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "expense",
+        sa.Column(
+            "currency",
+            sa.String(3),
+            server_default=money.DEFAULT_CURRENCY,
+            nullable=False,
+        ),
+    )
+    op.add_column("expense", sa.Column("amount_minor", sa.BigInteger(), nullable=True))
+    op.execute(
+        "UPDATE expense SET amount_minor = round(coalesce(amount, 0)::numeric * %d)"
+        % SCALE
+    )
+    op.alter_column("expense", "amount_minor", nullable=False)
+    op.drop_column("expense", "amount")
+    for table in ROLLUP_TABLES:
+        for column in ("spend", "income"):
+            op.alter_column(
+                table,
+                column,
+                type_=sa.BigInteger(),
+                postgresql_using="round(%s::numeric * %d)::bigint" % (column, SCALE),
+            )
+
+
+def downgrade() -> None:
+    for table in ROLLUP_TABLES:
+        for column in ("spend", "income"):
+            op.alter_column(
+                table,
+                column,
+                type_=sa.Float(),
+                postgresql_using="%s / %d.0" % (column, SCALE),
+            )
+    op.add_column("expense", sa.Column("amount", sa.Float(), nullable=True))
+    op.execute("UPDATE expense SET amount = amount_minor / %d.0" % SCALE)
+    op.drop_column("expense", "amount_minor")
+    op.drop_column("expense", "currency")
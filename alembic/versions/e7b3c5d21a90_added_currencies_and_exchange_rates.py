@@ -0,0 +1,56 @@
+"""added currencies and exchange rates
+
+Revision ID: e7b3c5d21a90
+Revises: d4a1f08c9b37
+Create Date: 2026-10-18 14:38:12.904511
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from app import money
+
+# revision identifiers, used by Alembic.
+revision = "e7b3c5d21a90"
+down_revision = "d4a1f08c9b37"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "exchangerate",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("base", sa.String(3), nullable=False),
+        sa.Column("quote", sa.String(3), nullable=False),
+        sa.Column("rate_date", sa.Date(), nullable=False),
+        sa.Column("rate", sa.Numeric(20, 10), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "base", "quote", "rate_date", name="uq_exchangerate_pair_date"
+        ),
+    )
+    op.add_column(
+        "user",
+        sa.Column(
+            "base_currency",
+            sa.String(3),
+            server_default=money.DEFAULT_CURRENCY,
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "expensegroup",
+        sa.Column(
+            "currency",
+            sa.String(3),
+            server_default=money.DEFAULT_CURRENCY,
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("expensegroup", "currency")
+    op.drop_column("user", "base_currency")
+    op.drop_table("exchangerate")
@@ -0,0 +1,48 @@
+"""added per user query indexes
+
+Revision ID: e9a39921b5be
+Revises: fe0628bee906
+Create Date: 2026-10-18 12:35:04.118213
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e9a39921b5be"
+down_revision = "fe0628bee906"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_expense_created_by_id_payment_date_id",
+        "expense",
+        [
+            "created_by_id",
+            sa.text("payment_date DESC NULLS LAST"),
+            sa.text("id DESC"),
+        ],
+    )
+    op.create_index(
+        "ix_expense_created_by_id_category_id",
+        "expense",
+        ["created_by_id", "category_id"],
+    )
+    op.create_index("ix_expense_category_id", "expense", ["category_id"])
+    op.create_index(
+        "ix_expensecategory_created_by_id_created_at",
+        "expensecategory",
+        ["created_by_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_expensecategory_created_by_id_created_at", table_name="expensecategory"
+    )
+    op.drop_index("ix_expense_category_id", table_name="expense")
+    op.drop_index("ix_expense_created_by_id_category_id", table_name="expense")
+    op.drop_index("ix_expense_created_by_id_payment_date_id", table_name="expense")
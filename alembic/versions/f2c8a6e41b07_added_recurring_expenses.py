@@ -0,0 +1,84 @@
+"""added recurring expenses
+
+Revision ID: f2c8a6e41b07
+Revises: e7b3c5d21a90
+Create Date: 2026-10-18 15:21:47.318624
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f2c8a6e41b07"
+down_revision = "e7b3c5d21a90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recurrencerule",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("template_expense_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "frequency",
+            sa.Enum("daily", "weekly", "monthly", "yearly", name="frequencyenum"),
+            nullable=False,
+        ),
+        sa.Column("interval", sa.Integer(), nullable=False),
+        sa.Column("starts_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ends_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("occurrences", sa.Integer(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=False),
+        sa.Column("created_by_id", sa.Integer(), nullable=True),
+        sa.Column("updated_by_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["template_expense_id"], ["expense.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(
+            ["created_by_id"],
+            ["user.id"],
+            name="fk_RecurrenceRule_created_by_id",
+        ),
+        sa.ForeignKeyConstraint(
+            ["updated_by_id"],
+            ["user.id"],
+            name="fk_RecurrenceRule_updated_by_id",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("template_expense_id"),
+    )
+    op.create_index(
+        "ix_recurrencerule_active_next_run_at",
+        "recurrencerule",
+        ["active", "next_run_at"],
+    )
+    op.add_column(
+        "expense", sa.Column("recurrence_rule_id", sa.Integer(), nullable=True)
+    )
+    op.add_column("expense", sa.Column("idempotency_key", sa.String(), nullable=True))
+    op.create_foreign_key(
+        "fk_expense_recurrence_rule_id",
+        "expense",
+        "recurrencerule",
+        ["recurrence_rule_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.create_unique_constraint(
+        "expense_idempotency_key_key", "expense", ["idempotency_key"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("expense_idempotency_key_key", "expense", type_="unique")
+    op.drop_constraint("fk_expense_recurrence_rule_id", "expense", type_="foreignkey")
+    op.drop_column("expense", "idempotency_key")
+    op.drop_column("expense", "recurrence_rule_id")
+    op.drop_index("ix_recurrencerule_active_next_run_at", table_name="recurrencerule")
+    op.drop_table("recurrencerule")
+    sa.Enum(name="frequencyenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,260 @@
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache(object):
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend(object):
+    """In-process backend; keys set without a ttl (version counters) never expire."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self._expiring = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._persistent = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._persistent.get(key)
+        return self._expiring.get(key) if value is None else value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None, nx=False):
+        with self._lock:
+            if nx and self.get(key) is not None:
+                return
+            if ttl is None:
+                self._persistent[key] = value
+            else:
+                self._expiring.set(key, value, ttl=ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._persistent.get(key, b"0")) + 1
+            self._persistent[key] = str(value).encode()
+            return value
+
+    def stats(self) -> dict:
+        return self._expiring.stats()
+
+
+class RedisBackend(object):
+    """Response cache backend over any client with redis-py's get/set/incr."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None, nx=False):
+        self.client.set(key, value, ex=None if ttl is None else int(ttl), nx=nx)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ResponseCache(object):
+    """Caches serialized GET responses per user, keyed by a per-user version.
+
+    Writes bump the user's version, which orphans every cached entry of that
+    user at once; orphaned entries simply age out through their TTL.
+    """
+
+    def __init__(self, backend, ttl: float = 60, prefix: str = "resp"):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _version_key(self, user_id) -> str:
+        return "%s:version:%s" % (self.prefix, user_id)
+
+    def version(self, user_id) -> bytes:
+        key = self._version_key(user_id)
+        version = self.backend.get(key)
+        if version is None:
+            # Start from the clock so a lost counter never revives old entries.
+            self.backend.set(key, str(time.time_ns()).encode(), nx=True)
+            version = self.backend.get(key)
+        return version
+
+    def bump(self, user_id):
+        key = self._version_key(user_id)
+        if self.backend.incr(key) == 1:
+            # The counter was flushed or evicted and restarted at 1, which an
+            # older entry may still be keyed on; restart it from the clock.
+            self.backend.set(key, str(time.time_ns()).encode())
+
+    def key(self, user_id, request: Request) -> str:
+        query = "&".join(sorted(request.url.query.split("&")))
+        return "%s:%s:%s:%s?%s" % (
+            self.prefix,
+            user_id,
+            self.version(user_id).decode(),
+            request.url.path,
+            query,
+        )
+
+    def get(self, key: str) -> Optional[tuple]:
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        meta, body = entry.split(b"\n", 1)
+        return orjson.loads(meta), body
+
+    def store(self, key: str, response: Response) -> tuple:
+        body = response.body
+        meta = {
+            "etag": '"%s"' % hashlib.sha1(body).hexdigest(),
+            "media_type": response.media_type,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name not in ("content-length", "content-type")
+            },
+        }
+        self.backend.set(key, orjson.dumps(meta) + b"\n" + body, ttl=self.ttl)
+        return meta, body
+
+    @staticmethod
+    def respond(entry: tuple, request: Request) -> Response:
+        meta, body = entry
+        headers = dict(meta["headers"], ETag=meta["etag"])
+        headers["Cache-Control"] = "private, no-cache"
+        if_none_match = request.headers.get("if-none-match", "")
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if meta["etag"] in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=meta["media_type"], headers=headers)
+
+    def stats(self) -> dict:
+        return dict(self.backend.stats(), hits=self.hits, misses=self.misses)
+
+
+def _build_backend():
+    if settings.CACHE_BACKEND == "redis":
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(settings.CACHE_REDIS_URL))
+    return MemoryBackend(
+        maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL
+    )
+
+
+response_cache = ResponseCache(_build_backend(), ttl=settings.RESPONSE_CACHE_TTL)
+registry.register_stats(
+    "response_cache", response_cache.stats, counters=("hits", "misses")
+)
+
+
+def warn_if_process_local():
+    """Warn a script that its version bumps cannot reach the API processes.
+
+    With the in-memory backend each process has its own versions, so the API
+    keeps serving cached responses until RESPONSE_CACHE_TTL after a script
+    changes data; run the API and scripts on a shared (redis) backend.
+    """
+    if isinstance(response_cache.backend, MemoryBackend):
+        logger.warning(
+            "CACHE_BACKEND=memory: running API processes may serve stale "
+            "responses for up to %ss",
+            response_cache.ttl,
+        )
+
+
+def cached_response(endpoint):
+    """Serve an endpoint's JSON from `response_cache`, with ETag revalidation.
+
+    The endpoint must take `request` and return a Response or JSON-able data;
+    streaming and non-200 responses pass through uncached.
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        request = kwargs["request"]
+        key = response_cache.key(request.state.user_id, request)
+        entry = response_cache.get(key)
+        if entry is None:
+            response = await endpoint(*args, **kwargs)
+            if not isinstance(response, Response):
+                response = Response(
+                    orjson.dumps(response, default=jsonable_encoder),
+                    media_type="application/json",
+                )
+            if isinstance(response, StreamingResponse) or response.status_code != 200:
+                return response
+            entry = response_cache.store(key, response)
+        return response_cache.respond(entry, request)
+
+    return wrapper
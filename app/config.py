@@ -9,12 +9,54 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str
     POSTGRES_HOSTNAME: str
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    N_PLUS_ONE_MODE: str = "off"
+    N_PLUS_ONE_THRESHOLD: int = 5
+
+    DEFAULT_CURRENCY: str = "USD"
+    RATE_CACHE_SIZE: int = 1024
+    RATE_CACHE_TTL: int = 3600
+
+    BULK_INSERT_BATCH_SIZE: int = 1000
+    BULK_IMPORT_MAX_ROWS: int = 10000
+
+    RECURRENCE_SCHEDULER_ENABLED: bool = True
+    RECURRENCE_INTERVAL: int = 60
+    RECURRENCE_BATCH_SIZE: int = 100
+    RECURRENCE_RETRY_DELAY: int = 3600
+
+    LEDGER_SNAPSHOT_ENABLED: bool = True
+    LEDGER_SNAPSHOT_INTERVAL: int = 3600
+    LEDGER_SNAPSHOT_KEEP: int = 3
+
     JWT_PUBLIC_KEY: str
     JWT_PRIVATE_KEY: str
     REFRESH_TOKEN_EXPIRES_IN: int
     ACCESS_TOKEN_EXPIRES_IN: int
     JWT_ALGORITHM: str
 
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: int = 300
+    TOKEN_CACHE_SIZE: int = 10000
+    PASSWORD_SCHEMES: str = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 2
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # "memory" keeps cache versions per process; use "redis" when several API
+    # processes or the maintenance scripts write data.
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_SIZE: int = 4096
+    RESPONSE_CACHE_TTL: int = 300
+
     CLIENT_ORIGIN: str
 
     DEBUG: bool
@@ -0,0 +1,400 @@
+"""Pairwise balance ledger for group expenses.
+
+Group expense writes call `record` inside their own transaction. `record`
+appends the pair deltas to `BalanceEntry` and folds them into `PairBalance`
+and `GroupMemberBalance`, so balance reads never aggregate splits. Amounts
+are integer minor units of the group's currency throughout.
+`snapshot`, `verify` and `repair` back scripts/verify_ledger.py; the app
+also runs `run_snapshots` as a background task so replays stay short.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+    union_all,
+)
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models import expense_model, group_model
+from app.models.ledger_model import (
+    BalanceEntry,
+    GroupMemberBalance,
+    PairBalance,
+    PairBalanceSnapshot,
+)
+from app.rollups import upsert_increment
+from db import get_async_session, session_scope
+
+logger = logging.getLogger(__name__)
+
+
+def expense_entry(group_id, paid_by_id, amount, splits):
+    """The ledger-relevant fields of a group expense; `splits` are (user_id, owed) pairs.
+
+    `amount` and the owed amounts are minor units.
+    """
+    return (group_id, paid_by_id, amount, tuple(splits))
+
+
+def split_entry(expense):
+    """`expense_entry` for a GroupExpense whose splits are loaded."""
+    return expense_entry(
+        expense.group_id,
+        expense.paid_by_id,
+        expense.amount_minor,
+        [(split.user_id, split.amount_minor) for split in expense.splits],
+    )
+
+
+def ordered_pair(debtor_id, creditor_id, amount):
+    """Map "debtor owes creditor `amount`" onto the (a, b, a-owes-b) convention."""
+    if debtor_id < creditor_id:
+        return debtor_id, creditor_id, amount
+    return creditor_id, debtor_id, -amount
+
+
+def ledger_deltas(added=(), removed=()):
+    pairs = defaultdict(int)
+    members = defaultdict(lambda: [0, 0])
+    signed = [(1, entry) for entry in added] + [(-1, entry) for entry in removed]
+    for sign, (group_id, paid_by_id, amount, splits) in signed:
+        members[(group_id, paid_by_id)][0] += sign * amount
+        for user_id, owed in splits:
+            members[(group_id, user_id)][1] += sign * owed
+            if user_id != paid_by_id:
+                a, b, delta = ordered_pair(user_id, paid_by_id, owed)
+                pairs[(group_id, a, b)] += sign * delta
+    return (
+        {key: value for key, value in pairs.items() if value},
+        {key: (paid, owed) for key, (paid, owed) in members.items() if paid or owed},
+    )
+
+
+async def record(group_expense_id, added=(), removed=()):
+    """Append and apply the balance changes of one group expense write."""
+    pairs, members = ledger_deltas(added, removed)
+    db = get_async_session()
+    dialect_name = db.bind.dialect.name
+    if pairs:
+        rows = [
+            {"group_id": group_id, "user_a_id": a, "user_b_id": b}
+            for group_id, a, b in pairs
+        ]
+        await db.execute(
+            insert(BalanceEntry.__table__),
+            [
+                dict(row, amount=amount, group_expense_id=group_expense_id)
+                for row, amount in zip(rows, pairs.values())
+            ],
+        )
+        await db.execute(
+            upsert_increment(
+                dialect_name,
+                PairBalance.__table__,
+                [
+                    dict(row, balance=amount)
+                    for row, amount in zip(rows, pairs.values())
+                ],
+                ["group_id", "user_a_id", "user_b_id"],
+                columns=("balance",),
+            )
+        )
+    if members:
+        await db.execute(
+            upsert_increment(
+                dialect_name,
+                GroupMemberBalance.__table__,
+                [
+                    {
+                        "group_id": group_id,
+                        "user_id": user_id,
+                        "paid": paid,
+                        "owed": owed,
+                    }
+                    for (group_id, user_id), (paid, owed) in members.items()
+                ],
+                ["group_id", "user_id"],
+                columns=("paid", "owed"),
+            )
+        )
+
+
+def member_balance_statement(group_id):
+    """Running paid and owed totals for every member of a group."""
+    members = (
+        select(expense_model.ExpenseGroupUser.user_id)
+        .where(expense_model.ExpenseGroupUser.group_id == group_id)
+        .distinct()
+        .subquery()
+    )
+    return (
+        select(
+            members.c.user_id,
+            func.coalesce(GroupMemberBalance.paid, 0).label("paid"),
+            func.coalesce(GroupMemberBalance.owed, 0).label("owed"),
+        )
+        .select_from(
+            members.outerjoin(
+                GroupMemberBalance,
+                and_(
+                    GroupMemberBalance.group_id == group_id,
+                    GroupMemberBalance.user_id == members.c.user_id,
+                ),
+            )
+        )
+        .order_by(members.c.user_id)
+    )
+
+
+def user_pair_statement(group_id, user_id):
+    """What every counterparty owes `user_id` in a group; negative if `user_id` owes."""
+    return (
+        select(
+            case(
+                (PairBalance.user_a_id == user_id, PairBalance.user_b_id),
+                else_=PairBalance.user_a_id,
+            ).label("user_id"),
+            case(
+                (PairBalance.user_a_id == user_id, -PairBalance.balance),
+                else_=PairBalance.balance,
+            ).label("balance"),
+        )
+        .where(
+            PairBalance.group_id == group_id,
+            or_(PairBalance.user_a_id == user_id, PairBalance.user_b_id == user_id),
+        )
+        .order_by("user_id")
+    )
+
+
+def _replay_statement(since, upto=None):
+    """Snapshot `since` plus the ledger entries after it, up to entry `upto`."""
+    base = select(
+        PairBalanceSnapshot.group_id,
+        PairBalanceSnapshot.user_a_id,
+        PairBalanceSnapshot.user_b_id,
+        PairBalanceSnapshot.balance.label("amount"),
+    ).where(PairBalanceSnapshot.last_entry_id == since)
+    tail = select(
+        BalanceEntry.group_id,
+        BalanceEntry.user_a_id,
+        BalanceEntry.user_b_id,
+        BalanceEntry.amount,
+    ).where(BalanceEntry.id > since)
+    if upto is not None:
+        tail = tail.where(BalanceEntry.id <= upto)
+    flows = union_all(base, tail).subquery()
+    return select(
+        flows.c.group_id,
+        flows.c.user_a_id,
+        flows.c.user_b_id,
+        func.sum(flows.c.amount).label("balance"),
+    ).group_by(flows.c.group_id, flows.c.user_a_id, flows.c.user_b_id)
+
+
+def latest_snapshot(db):
+    return db.execute(select(func.max(PairBalanceSnapshot.last_entry_id))).scalar() or 0
+
+
+def _lock_ledger(db):
+    """Wait for in-flight ledger inserts to commit and hold off new ones.
+
+    Ids are assigned at insert time, so without the lock a transaction still
+    holding a lower id could commit after `max(id)` is read and be skipped by
+    every later replay. SHARE ROW EXCLUSIVE also serializes snapshots and
+    repairs. SQLite allows one writer at a time and needs no lock.
+    """
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE balanceentry IN SHARE ROW EXCLUSIVE MODE"))
+
+
+def snapshot(db, keep=3):
+    """Store pair balances as of the newest ledger entry; keeps the last `keep` snapshots."""
+    _lock_ledger(db)
+    since = latest_snapshot(db)
+    upto = db.execute(select(func.max(BalanceEntry.id))).scalar()
+    if upto is None or upto <= since:
+        db.commit()  # releases the lock
+        return None
+    replay = _replay_statement(since, upto).subquery()
+    db.execute(
+        insert(PairBalanceSnapshot.__table__).from_select(
+            ["group_id", "user_a_id", "user_b_id", "balance", "last_entry_id"],
+            select(
+                replay.c.group_id,
+                replay.c.user_a_id,
+                replay.c.user_b_id,
+                replay.c.balance,
+                literal(upto),
+            ),
+        )
+    )
+    kept = (
+        db.execute(
+            select(PairBalanceSnapshot.last_entry_id)
+            .distinct()
+            .order_by(PairBalanceSnapshot.last_entry_id.desc())
+            .limit(keep)
+        )
+        .scalars()
+        .all()
+    )
+    db.execute(
+        delete(PairBalanceSnapshot).where(PairBalanceSnapshot.last_entry_id < min(kept))
+    )
+    db.commit()
+    return upto
+
+
+def _snapshot_in_new_session(keep):
+    with session_scope() as db:
+        return snapshot(db, keep=keep)
+
+
+async def run_snapshots(interval=None, keep=None):
+    """Snapshot the ledger every `interval` seconds until cancelled."""
+    interval = interval or settings.LEDGER_SNAPSHOT_INTERVAL
+    keep = keep or settings.LEDGER_SNAPSHOT_KEEP
+    while True:
+        try:
+            await run_in_threadpool(_snapshot_in_new_session, keep)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Snapshotting the balance ledger failed")
+        await asyncio.sleep(interval)
+
+
+def expected_balances(db):
+    """Recompute pair and member balances from the split table."""
+    expense = group_model.GroupExpense
+    split = group_model.ExpenseSplit
+    pairs = defaultdict(int)
+    members = defaultdict(lambda: [0, 0])
+    # Postgres sums bigints as numeric, hence the int() calls.
+    owed_to_payer = db.execute(
+        select(
+            split.group_id,
+            split.user_id,
+            expense.paid_by_id,
+            func.sum(split.amount_minor),
+        )
+        .join(expense, expense.id == split.group_expense_id)
+        .where(split.user_id != expense.paid_by_id)
+        .group_by(split.group_id, split.user_id, expense.paid_by_id)
+    )
+    for group_id, debtor_id, creditor_id, amount in owed_to_payer:
+        a, b, delta = ordered_pair(debtor_id, creditor_id, int(amount))
+        pairs[(group_id, a, b)] += delta
+    paid = db.execute(
+        select(
+            expense.group_id, expense.paid_by_id, func.sum(expense.amount_minor)
+        ).group_by(expense.group_id, expense.paid_by_id)
+    )
+    for group_id, user_id, amount in paid:
+        members[(group_id, user_id)][0] += int(amount)
+    owed = db.execute(
+        select(split.group_id, split.user_id, func.sum(split.amount_minor)).group_by(
+            split.group_id, split.user_id
+        )
+    )
+    for group_id, user_id, amount in owed:
+        members[(group_id, user_id)][1] += int(amount)
+    return pairs, members
+
+
+def _differences(actual, expected):
+    for key in sorted(set(actual) | set(expected)):
+        have, want = actual.get(key, 0), expected.get(key, 0)
+        if have != want:
+            yield key, have, want
+
+
+def verify(db):
+    """Return a description of every balance the ledger or running tables get wrong."""
+    pairs, members = expected_balances(db)
+    ledger = {
+        (row.group_id, row.user_a_id, row.user_b_id): int(row.balance)
+        for row in db.execute(_replay_statement(latest_snapshot(db)))
+    }
+    running = {
+        (row.group_id, row.user_a_id, row.user_b_id): row.balance
+        for row in db.execute(select(PairBalance)).scalars().all()
+    }
+    member_rows = db.execute(select(GroupMemberBalance)).scalars().all()
+    problems = []
+    for key, have, want in _differences(ledger, pairs):
+        problems.append("ledger pair %s: %d, splits say %d" % (key, have, want))
+    for key, have, want in _differences(running, pairs):
+        problems.append("running pair %s: %d, splits say %d" % (key, have, want))
+    for index, name in enumerate(("paid", "owed")):
+        actual = {
+            (row.group_id, row.user_id): getattr(row, name) for row in member_rows
+        }
+        expected = {key: totals[index] for key, totals in members.items()}
+        for key, have, want in _differences(actual, expected):
+            problems.append("member %s %s: %d, splits say %d" % (key, name, have, want))
+    return problems
+
+
+def repair(db):
+    """Make the ledger and running tables agree with the splits again.
+
+    The ledger stays append-only: differences are appended as correcting
+    entries without a `group_expense_id`.
+    """
+    _lock_ledger(db)
+    pairs, members = expected_balances(db)
+    ledger = {
+        (row.group_id, row.user_a_id, row.user_b_id): int(row.balance)
+        for row in db.execute(_replay_statement(latest_snapshot(db)))
+    }
+    corrections = [
+        {
+            "group_id": group_id,
+            "user_a_id": a,
+            "user_b_id": b,
+            "amount": want - have,
+        }
+        for (group_id, a, b), have, want in _differences(ledger, pairs)
+    ]
+    if corrections:
+        db.execute(insert(BalanceEntry.__table__), corrections)
+    db.execute(delete(PairBalance))
+    db.execute(delete(GroupMemberBalance))
+    pair_rows = [
+        {
+            "group_id": group_id,
+            "user_a_id": a,
+            "user_b_id": b,
+            "balance": v,
+        }
+        for (group_id, a, b), v in pairs.items()
+    ]
+    if pair_rows:
+        db.execute(insert(PairBalance.__table__), pair_rows)
+    member_rows = [
+        {
+            "group_id": group_id,
+            "user_id": user_id,
+            "paid": paid,
+            "owed": owed,
+        }
+        for (group_id, user_id), (paid, owed) in members.items()
+    ]
+    if member_rows:
+        db.execute(insert(GroupMemberBalance.__table__), member_rows)
+    db.commit()
+    return len(corrections)
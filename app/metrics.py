@@ -0,0 +1,291 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy import event
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+LAZY_LOAD_MODES = ("off", "log", "raise")
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram(object):
+    """Thread-safe cumulative histogram in the Prometheus bucket layout."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "buckets": list(zip(self.buckets, self.counts)),
+                "count": self.count,
+                "sum": self.sum,
+            }
+
+
+class RequestStats(object):
+    """Database work done on behalf of the current request."""
+
+    __slots__ = ("queries", "db_seconds", "lazy_loads")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.lazy_loads = 0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+# Start times live on the per-statement execution context, so a statement that
+# fails (and never fires after_cursor_execute) leaves nothing behind.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "query_started", None)
+    stats = _request_stats.get()
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def install_query_hooks(engine):
+    """Count queries and DB time on `engine` towards the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class LazyLoadLimitExceeded(RuntimeError):
+    pass
+
+
+def install_lazy_load_detector(session_class, mode: str, threshold: int):
+    """Count relationship loads per request on every `session_class` session.
+
+    Past `threshold` loads in one request the detector logs once ("log") or
+    raises `LazyLoadLimitExceeded` on each further load ("raise"). selectin
+    and subquery eager loads count too, but only once per query, so endpoints
+    with explicit loading strategies stay well under a small threshold.
+    """
+    if mode not in LAZY_LOAD_MODES:
+        raise ValueError(
+            "N_PLUS_ONE_MODE must be one of %s" % ", ".join(LAZY_LOAD_MODES)
+        )
+    if mode == "off":
+        return
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _count_relationship_load(orm_execute_state):
+        if not orm_execute_state.is_relationship_load:
+            return
+        stats = _request_stats.get()
+        if stats is None:
+            return
+        stats.lazy_loads += 1
+        if stats.lazy_loads <= threshold:
+            return
+        message = "%d relationship loads in one request (threshold %d), last: %s" % (
+            stats.lazy_loads,
+            threshold,
+            orm_execute_state.loader_strategy_path,
+        )
+        if mode == "raise":
+            raise LazyLoadLimitExceeded(message)
+        if stats.lazy_loads == threshold + 1:
+            logger.warning(message)
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{%s}" % pairs
+
+
+class Registry(object):
+    """Per-route request metrics plus stats collectors registered by other modules."""
+
+    def __init__(self):
+        self.latency: Dict[tuple, Histogram] = defaultdict(Histogram)
+        self.queries: Dict[tuple, Histogram] = defaultdict(
+            lambda: Histogram(QUERY_COUNT_BUCKETS)
+        )
+        self.db_seconds: Dict[tuple, float] = defaultdict(float)
+        self.responses: Dict[tuple, int] = defaultdict(int)
+        self.histograms: Dict[str, tuple] = {}
+        self.collectors: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method, route, status, seconds, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            latency = self.latency[key]
+            queries = self.queries[key]
+            self.db_seconds[key] += stats.db_seconds
+            self.responses[key + (status,)] += 1
+        latency.observe(seconds)
+        queries.observe(stats.queries)
+
+    def register_histogram(self, name: str, histogram: Histogram, help_text: str):
+        self.histograms[name] = (histogram, help_text)
+
+    def register_stats(
+        self, prefix: str, collect: Callable[[], dict], counters: Sequence[str] = ()
+    ):
+        """Expose each numeric value of `collect()` as ``<prefix>_<key>``."""
+        self.collectors[prefix] = (collect, frozenset(counters))
+
+    def render(self) -> str:
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s histogram" % name)
+            for labels, hist in series:
+                snap = hist.snapshot()
+                for bound, count in snap["buckets"]:
+                    lines.append(
+                        "%s_bucket%s %d" % (name, _labels(**labels, le=bound), count)
+                    )
+                lines.append(
+                    "%s_bucket%s %d"
+                    % (name, _labels(**labels, le="+Inf"), snap["count"])
+                )
+                lines.append("%s_sum%s %f" % (name, _labels(**labels), snap["sum"]))
+                lines.append("%s_count%s %d" % (name, _labels(**labels), snap["count"]))
+
+        def scalar(name, kind, help_text, series):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, value in series:
+                lines.append("%s%s %s" % (name, _labels(**labels), value))
+
+        with self._lock:
+            latency = sorted(self.latency.items())
+            queries = sorted(self.queries.items())
+            db_seconds = sorted(self.db_seconds.items())
+            responses = sorted(self.responses.items())
+
+        histogram(
+            "http_request_duration_seconds",
+            "Request latency by route.",
+            [({"method": m, "route": r}, h) for (m, r), h in latency],
+        )
+        histogram(
+            "http_request_db_queries",
+            "Database queries issued per request by route.",
+            [({"method": m, "route": r}, h) for (m, r), h in queries],
+        )
+        scalar(
+            "http_request_db_seconds_total",
+            "counter",
+            "Time spent in database queries by route.",
+            [({"method": m, "route": r}, "%f" % v) for (m, r), v in db_seconds],
+        )
+        scalar(
+            "http_responses_total",
+            "counter",
+            "Responses by route and status code.",
+            [({"method": m, "route": r, "status": s}, v) for (m, r, s), v in responses],
+        )
+        for name, (hist, help_text) in sorted(self.histograms.items()):
+            histogram(name, help_text, [({}, hist)])
+        for prefix, (collect, counters) in sorted(self.collectors.items()):
+            for key, value in sorted(collect().items()):
+                if not isinstance(value, (int, float)):
+                    continue
+                if key in counters:
+                    name, kind = "%s_%s_total" % (prefix, key), "counter"
+                else:
+                    name, kind = "%s_%s" % (prefix, key), "gauge"
+                scalar(name, kind, "%s %s." % (prefix, key), [({}, value)])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _route_path(scope: Scope) -> str:
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Records per-route latency and DB usage and adds a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = 'db;dur=%.1f;desc="%d queries", app;dur=%.1f' % (
+                    stats.db_seconds * 1000,
+                    stats.queries,
+                    (time.perf_counter() - started) * 1000,
+                )
+                if stats.lazy_loads:
+                    timing += ', orm;desc="%d relationship loads"' % stats.lazy_loads
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            registry.observe_request(
+                scope["method"],
+                _route_path(scope),
+                status,
+                time.perf_counter() - started,
+                stats,
+            )
@@ -1,14 +1,31 @@
 from starlette_context.middleware import RawContextMiddleware 
-from starlette.requests import Request
-from fastapi_jwt_auth import AuthJWT
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
+from fastapi_jwt_auth.exceptions import AuthJWTException
+
+from app.oauth2 import verify_request_token
+from db import async_session_scope, session_scope
 
 
 class CustomContextMiddleware(RawContextMiddleware):
-    async def set_context(self, request: Request):
+    async def set_context(self, request: HTTPConnection):
         try:
-            authorize = AuthJWT()
-            authorize._get_jwt_from_headers(request.scope['headers'][6][1].decode())
-            user_id = authorize.get_jwt_subject()
-        except:
+            user_id = int(verify_request_token(request)["sub"])
+        except AuthJWTException:
             user_id = None
-        return {"user_id": user_id}
\ No newline at end of file
+        return {"user_id": user_id}
+
+
+class DBSessionMiddleware:
+    """Binds one pooled sync and async session per request for BaseMixin to resolve."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        with session_scope():
+            async with async_session_scope():
+                await self.app(scope, receive, send)
@@ -1,13 +1,15 @@
 from fastapi import HTTPException, Request
-from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, insert, select
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from starlette_context import context
 
-from db import get_db
+from app.cache import response_cache
+from db import get_async_session, get_session
 
-db = next(get_db())
+# asyncpg accepts at most this many bind parameters in one statement.
+MAX_BIND_PARAMS = 32767
 
 
 class AuditMixin(object):
@@ -59,7 +61,7 @@ class BaseMixin(object):
 
     @classmethod
     def query(cls):
-        return db.query(cls)
+        return get_session().query(cls)
 
     @classmethod
     def get(cls, id):
@@ -83,27 +85,144 @@ class BaseMixin(object):
         r = cls.get_by(**kw)
         if not r:
             r = cls(**kw)
+            db = get_session()
             db.add(r)
             db.commit()
             db.refresh(r)
+            _bump_cache_version()
 
         return r
 
     @classmethod
     def create(cls, **kw):
         r = cls(**kw)
+        db = get_session()
         db.add(r)
         db.commit()
         db.refresh(r)
+        _bump_cache_version()
         return r
 
     def save(self):
+        db = get_session()
         db.add(self)
         db.commit()
+        _bump_cache_version()
 
     def delete(self):
+        db = get_session()
         db.delete(self)
         db.commit()
+        _bump_cache_version()
+
+    @classmethod
+    def select(cls):
+        return select(cls)
+
+    @classmethod
+    async def aexecute(cls, statement, params=None):
+        return await get_async_session().execute(statement, params)
+
+    @classmethod
+    async def ascalars(cls, statement):
+        result = await get_async_session().execute(statement)
+        return result.scalars().all()
+
+    @classmethod
+    async def astream(cls, statement, yield_per=500, params=None):
+        return await get_async_session().stream(
+            statement.execution_options(yield_per=yield_per), params
+        )
+
+    @classmethod
+    async def astream_scalars(cls, statement, yield_per=500):
+        result = await cls.astream(statement, yield_per=yield_per)
+        return result.scalars()
+
+    @classmethod
+    async def aget(cls, id, *options):
+        return await get_async_session().get(cls, id, options=options)
+
+    @classmethod
+    async def aget_by(cls, *options, **kw):
+        result = await get_async_session().execute(
+            cls.select().options(*options).filter_by(**kw).limit(1)
+        )
+        return result.scalars().first()
+
+    @classmethod
+    async def aget_for_update(cls, *options, **kw):
+        """Like aget_by, but locks the row until the current transaction ends."""
+        result = await get_async_session().execute(
+            cls.select()
+            .options(*options)
+            .filter_by(**kw)
+            .limit(1)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    @classmethod
+    async def aget_or_404(cls, id):
+        rv = await cls.aget(id)
+        if rv is None:
+            raise HTTPException(
+                status_code=404, detail=f"Item {cls.__name__} not found"
+            )
+        return rv
+
+    @classmethod
+    async def aget_or_create(cls, **kw):
+        r = await cls.aget_by(**kw)
+        if not r:
+            r = cls(**kw)
+            db = get_async_session()
+            db.add(r)
+            await db.commit()
+            await db.refresh(r)
+            _bump_cache_version()
+
+        return r
+
+    @classmethod
+    async def acreate(cls, **kw):
+        r = cls(**kw)
+        db = get_async_session()
+        db.add(r)
+        await db.commit()
+        await db.refresh(r)
+        _bump_cache_version()
+        return r
+
+    @classmethod
+    async def abulk_insert(cls, rows, batch_size=1000):
+        """Insert plain row dicts as multi-row batches committed in one transaction.
+
+        Each batch is one ``INSERT ... VALUES (...), (...)`` statement, so
+        every row needs the same keys.
+        """
+        db = get_async_session()
+        # Column defaults add parameters too, so bound by the whole table.
+        batch_size = min(batch_size, MAX_BIND_PARAMS // len(cls.__table__.columns))
+        for start in range(0, len(rows), batch_size):
+            await db.execute(
+                insert(cls.__table__).values(rows[start : start + batch_size])
+            )
+        await db.commit()
+        _bump_cache_version()
+
+    async def asave(self):
+        db = get_async_session()
+        db.add(self)
+        await db.commit()
+        _bump_cache_version()
+
+    async def adelete(self):
+        db = get_async_session()
+        await db.delete(self)
+        await db.commit()
+        _bump_cache_version()
 
     def __repr__(self):
         values = ", ".join(
@@ -117,6 +236,12 @@ class BaseMixin(object):
         return self.__str__()
 
 
+def _bump_cache_version():
+    user_id = _current_user_id_or_none(None)
+    if user_id is not None:
+        response_cache.bump(user_id)
+
+
 def _current_user_id_or_none(a):
     try:
         return context["user_id"]
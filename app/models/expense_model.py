@@ -1,17 +1,24 @@
 import enum
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Boolean,
     Column,
     DateTime,
     Enum,
-    Float,
     ForeignKey,
+    Index,
     Integer,
+    Numeric,
     String,
+    cast,
+    event,
 )
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
+from app import money
 from app.mixins import AuditMixin, BaseMixin
 from app.models import Base
 from app.models.user_model import User
@@ -21,6 +28,13 @@ class ExpenseCategory(Base, AuditMixin, BaseMixin):
     name = Column(String, nullable=False)
 
 
+Index(
+    "ix_expensecategory_created_by_id_created_at",
+    ExpenseCategory.created_by_id,
+    ExpenseCategory.created_at,
+)
+
+
 class PaidByEnum(enum.Enum):
     Bank = "Bank"
     Card = "Card"
@@ -30,21 +44,93 @@ class PaidByEnum(enum.Enum):
 class Expense(Base, AuditMixin, BaseMixin):
     name = Column(String, nullable=False)
     paid_by = Column(Enum(PaidByEnum), default=PaidByEnum.Cash, nullable=False)
-    amount = Column(Float, default=0.0)
+    # Signed (negative for spends) amount in minor units of `currency`.
+    amount_minor = Column(BigInteger, default=0, nullable=False)
+    currency = Column(String(3), default=money.DEFAULT_CURRENCY, nullable=False)
     is_spend = Column(Boolean, default=True, nullable=False)
     category_id = Column(Integer, ForeignKey(ExpenseCategory.id))
     payment_date = Column(DateTime(timezone=True))
     other_details = Column(String, nullable=True)
+    # Set on expenses materialized from a recurrence rule; the key is unique
+    # per rule occurrence so a replayed batch cannot create duplicates.
+    recurrence_rule_id = Column(
+        Integer,
+        ForeignKey(
+            "recurrencerule.id",
+            name="fk_expense_recurrence_rule_id",
+            ondelete="SET NULL",
+            use_alter=True,
+        ),
+    )
+    idempotency_key = Column(String, unique=True)
 
     category = relationship(
         "ExpenseCategory", foreign_keys="Expense.category_id", lazy="joined"
     )
 
+    @hybrid_property
+    def amount(self):
+        return money.from_minor(self.amount_minor, self.currency)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = money.to_minor(value, self.currency)
+
+    @amount.expression
+    def amount(cls):
+        return cast(cls.amount_minor, Numeric) / money.scale_expression(cls.currency)
+
+
+# Serves the (payment_date DESC NULLS LAST, id DESC) keyset listing. SQLite
+# cannot declare NULLS LAST on an index but already sorts NULLs last on DESC.
+event.listen(
+    Expense.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_expense_created_by_id_payment_date_id ON expense "
+        "(created_by_id, payment_date DESC NULLS LAST, id DESC)"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Expense.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_expense_created_by_id_payment_date_id ON expense "
+        "(created_by_id, payment_date DESC, id DESC)"
+    ).execute_if(
+        callable_=lambda ddl, target, bind, **kw: bind.dialect.name != "postgresql"
+    ),
+)
+Index(
+    "ix_expense_created_by_id_category_id", Expense.created_by_id, Expense.category_id
+)
+Index("ix_expense_category_id", Expense.category_id)
+
+# Text searched by GET /api/expense/search. Postgres stores its tsvector in a
+# generated column and indexes it, plus a trigram index on the same text for
+# prefix and fuzzy matches; app/search.py queries both.
+SEARCH_DOCUMENT = "(coalesce(name, '') || ' ' || coalesce(other_details, ''))"
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE expense ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', %s)) STORED" % SEARCH_DOCUMENT,
+    "CREATE INDEX ix_expense_search_vector ON expense USING gin (search_vector)",
+    "CREATE INDEX ix_expense_search_trgm ON expense USING gin "
+    "(%s gin_trgm_ops)" % SEARCH_DOCUMENT,
+):
+    event.listen(
+        Expense.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
 
 class ExpenseGroup(Base, AuditMixin, BaseMixin):
     name = Column(String, nullable=False)
     desc = Column(String, nullable=False)
     owner_id = Column(Integer, ForeignKey(User.id))
+    # Group expenses, splits and the balance ledger are all in this currency.
+    currency = Column(String(3), default=money.DEFAULT_CURRENCY, nullable=False)
 
     owner = relationship("User", foreign_keys="ExpenseGroup.owner_id", lazy="joined")
 
@@ -0,0 +1,84 @@
+import enum
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import relationship
+
+from app.mixins import AuditMixin, BaseMixin
+from app.models import Base
+from app.models.expense_model import ExpenseGroup
+from app.models.user_model import User
+
+
+class SplitTypeEnum(enum.Enum):
+    equal = "equal"
+    exact = "exact"
+    percentage = "percentage"
+
+
+class GroupExpense(Base, AuditMixin, BaseMixin):
+    """An expense paid by one member and shared between members of a group."""
+
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    name = Column(String, nullable=False)
+    # In minor units of the group's currency, like everything below.
+    amount_minor = Column(BigInteger, nullable=False)
+    paid_by_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    split_type = Column(
+        Enum(SplitTypeEnum), default=SplitTypeEnum.equal, nullable=False
+    )
+    payment_date = Column(DateTime(timezone=True))
+
+    splits = relationship(
+        "ExpenseSplit",
+        cascade="all, delete-orphan",
+        order_by="ExpenseSplit.user_id",
+        lazy="raise",
+    )
+
+
+Index(
+    "ix_groupexpense_group_id_payment_date",
+    GroupExpense.group_id,
+    GroupExpense.payment_date,
+)
+
+
+class ExpenseSplit(Base, BaseMixin):
+    """One member's share of a group expense.
+
+    `share` keeps the submitted exact amount or percentage; `amount_minor` is
+    the resolved amount owed. `group_id` is copied from the expense so balances
+    aggregate over a single indexed table.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "group_expense_id", "user_id", name="uq_expensesplit_expense_user"
+        ),
+    )
+
+    group_expense_id = Column(
+        Integer, ForeignKey(GroupExpense.id, ondelete="CASCADE"), nullable=False
+    )
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    amount_minor = Column(BigInteger, nullable=False)
+    share = Column(Float)
+
+
+Index("ix_expensesplit_group_id_user_id", ExpenseSplit.group_id, ExpenseSplit.user_id)
@@ -0,0 +1,94 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    UniqueConstraint,
+)
+from sqlalchemy.sql import func
+
+from app.mixins import BaseMixin
+from app.models import Base
+from app.models.expense_model import ExpenseGroup
+from app.models.user_model import User
+
+
+class BalanceEntry(Base, BaseMixin):
+    """Append-only ledger of pairwise balance deltas.
+
+    Pairs are stored ordered (`user_a_id` < `user_b_id`); a positive `amount`
+    means a owes b more. Amounts here and below are minor units of the
+    group's currency. Updates and deletes of group expenses append
+    compensating entries, so `group_expense_id` is deliberately not a foreign key.
+    """
+
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    user_a_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    user_b_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    amount = Column(BigInteger, nullable=False)
+    group_expense_id = Column(Integer)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+
+Index(
+    "ix_balanceentry_group_id_user_a_id_user_b_id",
+    BalanceEntry.group_id,
+    BalanceEntry.user_a_id,
+    BalanceEntry.user_b_id,
+)
+
+
+class PairBalance(Base, BaseMixin):
+    """Running sum of `BalanceEntry.amount` per group and ordered pair."""
+
+    __table_args__ = (
+        UniqueConstraint(
+            "group_id", "user_a_id", "user_b_id", name="uq_pairbalance_pair"
+        ),
+    )
+
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    user_a_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    user_b_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    balance = Column(BigInteger, default=0, nullable=False)
+
+
+Index("ix_pairbalance_group_id_user_b_id", PairBalance.group_id, PairBalance.user_b_id)
+
+
+class GroupMemberBalance(Base, BaseMixin):
+    """Running paid and owed totals per group member."""
+
+    __table_args__ = (
+        UniqueConstraint("group_id", "user_id", name="uq_groupmemberbalance_member"),
+    )
+
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    paid = Column(BigInteger, default=0, nullable=False)
+    owed = Column(BigInteger, default=0, nullable=False)
+
+
+class PairBalanceSnapshot(Base, BaseMixin):
+    """Pair balances as of ledger entry `last_entry_id`.
+
+    Each snapshot is the previous one plus the entries after it, so checking
+    the running table only needs to replay the ledger tail.
+    """
+
+    last_entry_id = Column(Integer, nullable=False, index=True)
+    taken_at = Column(DateTime(timezone=True), default=func.now())
+    group_id = Column(
+        Integer, ForeignKey(ExpenseGroup.id, ondelete="CASCADE"), nullable=False
+    )
+    user_a_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    user_b_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    balance = Column(BigInteger, nullable=False)
@@ -1,3 +1,8 @@
 from app.models import Base
 from app.models.expense_model import *
+from app.models.group_model import *
+from app.models.ledger_model import *
+from app.models.rate_model import *
+from app.models.recurrence_model import *
+from app.models.rollup_model import *
 from app.models.user_model import *
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Date, Numeric, String, UniqueConstraint
+
+from app.mixins import BaseMixin
+from app.models import Base
+
+
+class ExchangeRate(Base, BaseMixin):
+    """One unit of `base` is worth `rate` units of `quote` from `rate_date` on.
+
+    The unique key doubles as the (base, quote, rate_date) index that
+    app/rates.py probes for the latest rate on or before a date.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "base", "quote", "rate_date", name="uq_exchangerate_pair_date"
+        ),
+    )
+
+    base = Column(String(3), nullable=False)
+    quote = Column(String(3), nullable=False)
+    rate_date = Column(Date, nullable=False)
+    rate = Column(Numeric(20, 10), nullable=False)
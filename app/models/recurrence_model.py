@@ -0,0 +1,53 @@
+import enum
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+)
+
+from app.mixins import AuditMixin, BaseMixin
+from app.models import Base
+from app.models.expense_model import Expense
+
+
+class FrequencyEnum(enum.Enum):
+    daily = "daily"
+    weekly = "weekly"
+    monthly = "monthly"
+    yearly = "yearly"
+
+
+class RecurrenceRule(Base, AuditMixin, BaseMixin):
+    """Repeats a template expense every `interval` `frequency` units.
+
+    Occurrence 0 is the template itself, dated `starts_at`. `occurrences` is
+    the index of the next occurrence to materialize and `next_run_at` its
+    date, or a later retry time when its exchange rate is missing;
+    app/recurrence.py advances both as it creates expenses.
+    """
+
+    template_expense_id = Column(
+        Integer,
+        ForeignKey(Expense.id, ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+    )
+    frequency = Column(Enum(FrequencyEnum), nullable=False)
+    interval = Column(Integer, default=1, nullable=False)
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    ends_at = Column(DateTime(timezone=True))
+    occurrences = Column(Integer, default=1, nullable=False)
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    active = Column(Boolean, default=True, nullable=False)
+
+
+Index(
+    "ix_recurrencerule_active_next_run_at",
+    RecurrenceRule.active,
+    RecurrenceRule.next_run_at,
+)
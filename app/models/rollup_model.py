@@ -0,0 +1,37 @@
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Integer, UniqueConstraint
+
+from app.mixins import BaseMixin
+from app.models import Base
+from app.models.expense_model import ExpenseCategory
+from app.models.user_model import User
+
+
+class ExpenseRollup(Base, BaseMixin):
+    """Per user, category and month totals maintained alongside expense writes.
+
+    `spend` and `income` are in minor units, like `Expense.amount_minor`.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "category_id", "month", name="uq_expenserollup_bucket"
+        ),
+    )
+
+    user_id = Column(Integer, ForeignKey(User.id), nullable=False)
+    category_id = Column(
+        Integer, ForeignKey(ExpenseCategory.id, ondelete="CASCADE"), nullable=False
+    )
+    month = Column(Date, nullable=False)
+    spend = Column(BigInteger, default=0, nullable=False)
+    income = Column(BigInteger, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+
+class UserBalance(Base, BaseMixin):
+    """Running income and spend per user, in minor units."""
+
+    user_id = Column(Integer, ForeignKey(User.id), unique=True, nullable=False)
+    spend = Column(BigInteger, default=0, nullable=False)
+    income = Column(BigInteger, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
@@ -1,5 +1,6 @@
 from sqlalchemy import Column, String
 
+from app import money
 from app.mixins import BaseMixin
 from app.models import Base
 
@@ -9,3 +10,4 @@ class User(Base, BaseMixin):
     last_name = Column(String)
     email = Column(String, unique=True)
     hashed_password = Column(String)
+    base_currency = Column(String(3), default=money.DEFAULT_CURRENCY, nullable=False)
@@ -0,0 +1,59 @@
+"""Money amounts as integer minor units (cents for most currencies).
+
+Expense amounts are stored, summed and compared as integers; these helpers
+convert at the API edges. Inputs go through `Decimal(str(...))` so a JSON
+float such as 12.34 becomes exactly 1234.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import case
+
+from app.config import settings
+
+DEFAULT_CURRENCY = settings.DEFAULT_CURRENCY
+
+# ISO 4217 minor unit exponents that are not 2.
+EXPONENTS = {
+    "BHD": 3,
+    "CLP": 0,
+    "ISK": 0,
+    "JOD": 3,
+    "JPY": 0,
+    "KRW": 0,
+    "KWD": 3,
+    "OMR": 3,
+    "TND": 3,
+    "UGX": 0,
+    "VND": 0,
+}
+
+
+def exponent(currency=None) -> int:
+    return EXPONENTS.get(currency or DEFAULT_CURRENCY, 2)
+
+
+def to_minor(amount, currency=None) -> int:
+    """Round `amount` half-up to the nearest minor unit of `currency`."""
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int(amount.scaleb(exponent(currency)).quantize(1, ROUND_HALF_UP))
+
+
+def from_minor(minor, currency=None) -> Decimal:
+    return Decimal(minor or 0).scaleb(-exponent(currency))
+
+
+def to_float(minor, currency=None) -> float:
+    """`minor` as a float for JSON; dividing by an exact power of ten keeps 12.34 as 12.34."""
+    return (minor or 0) / 10 ** exponent(currency)
+
+
+def scale_expression(currency_column):
+    """SQL for 10 ** exponent(currency), to turn minor units back into amounts."""
+    by_scale = {}
+    for code, places in EXPONENTS.items():
+        by_scale.setdefault(10**places, []).append(code)
+    return case(
+        *((currency_column.in_(codes), scale) for scale, codes in by_scale.items()),
+        else_=100,
+    )
@@ -1,13 +1,32 @@
 import base64
-from typing import List
+import hashlib
+import time
+from typing import List, Optional
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import HTTPException, Request, status
 from fastapi_jwt_auth import AuthJWT
+from fastapi_jwt_auth.exceptions import (
+    AccessTokenRequired,
+    AuthJWTException,
+    JWTDecodeError,
+    MissingTokenError,
+)
 from pydantic import BaseModel
+from sqlalchemy import event
+from starlette.requests import HTTPConnection
 
+from app.cache import TTLCache
 from app.config import settings
+from app.metrics import registry
 from app.models.user_model import User
 
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRES_IN * 60
+)
+registry.register_stats("user_cache", user_cache.stats, counters=("hits", "misses"))
+registry.register_stats("token_cache", token_cache.stats, counters=("hits", "misses"))
+
 
 class Settings(BaseModel):
     authjwt_algorithm: str = settings.JWT_ALGORITHM
@@ -27,15 +46,94 @@ def get_config():
     return Settings()
 
 
+def get_raw_token(request: HTTPConnection) -> Optional[str]:
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        parts = authorization.split()
+        if len(parts) == 2 and parts[0] == "Bearer":
+            return parts[1]
+    return request.cookies.get("access_token")
+
+
+def decode_access_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is None:
+        authorize = AuthJWT()
+        try:
+            claims = authorize._verified_token(token, authorize._decode_issuer)
+        except AuthJWTException:
+            raise
+        except Exception as e:
+            # e.g. an HS256 header sends fastapi_jwt_auth looking for a secret
+            # key that is not configured, which raises RuntimeError.
+            raise JWTDecodeError(status_code=422, message=str(e))
+        if claims.get("type") != "access":
+            raise AccessTokenRequired(
+                status_code=422, message="Only access tokens are allowed"
+            )
+        try:
+            int(claims["sub"])
+        except (KeyError, TypeError, ValueError):
+            raise JWTDecodeError(status_code=422, message="Invalid subject claim")
+        if "exp" in claims:
+            ttl = claims["exp"] - time.time()
+            if ttl <= 0:
+                raise JWTDecodeError(status_code=422, message="Signature has expired")
+            token_cache.set(key, claims, ttl=min(ttl, token_cache.ttl))
+    return claims
+
+
+def verify_request_token(request: HTTPConnection) -> dict:
+    """Verify the access token once per request and keep the outcome on its scope."""
+    state = request.state
+    if not hasattr(state, "jwt_claims"):
+        state.jwt_claims, state.jwt_error = None, None
+        try:
+            token = get_raw_token(request)
+            if not token:
+                raise MissingTokenError(
+                    status_code=401, message="Missing Authorization Header"
+                )
+            state.jwt_claims = decode_access_token(token)
+        except AuthJWTException as e:
+            state.jwt_error = e
+    if state.jwt_error is not None:
+        raise state.jwt_error
+    return state.jwt_claims
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(str(target.id))
+
+
+def get_user_profile(user_id):
+    key = str(user_id)
+    profile = user_cache.get(key)
+    if profile is None:
+        user = User.get(user_id)
+        if not user:
+            return None
+        profile = {
+            "id": user.id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "base_currency": user.base_currency,
+        }
+        user_cache.set(key, profile)
+    return profile
+
+
 def require_user(
     request: Request,
-    Authorize: AuthJWT = Depends(),
 ):
     try:
-        Authorize.jwt_required()
-        user_id = Authorize.get_jwt_subject()
+        user_id = int(verify_request_token(request)["sub"])
 
-        user = User.get(user_id)
+        user = get_user_profile(user_id)
 
         if not user:
             raise HTTPException("User no longer exist")
@@ -60,3 +158,4 @@ def require_user(
             detail="Token is invalid or has expired",
         )
     request.state.user_id = user_id
+    request.state.user = user
@@ -0,0 +1,156 @@
+"""Currency conversion against the local exchange rate table.
+
+The rate for a conversion is the latest `ExchangeRate` for the currency pair
+on or before the expense's date. SQL aggregates convert row by row with
+`converted_minor`, a correlated lookup on the (base, quote, rate_date) key.
+Writes that need a single conversion in Python (rollups, settlement views)
+go through `rate_cache`, which keeps each pair's rate series in memory.
+"""
+from bisect import bisect_right
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    case,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+)
+
+from app import money
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import registry
+from app.models import expense_model
+from app.models.rate_model import ExchangeRate
+from app.utils import as_utc
+
+
+MISSING_PAIR_TTL = 60
+
+
+class MissingRate(ValueError):
+    def __init__(self, source, target, on):
+        super().__init__(f"No exchange rate from {source} to {target} on {on}.")
+
+
+def _as_date(on):
+    """The UTC date of `on`, matching `_day`; None means today.
+
+    Callers pass an expense's `payment_date` or, when it has none, its
+    `created_at`, like `expense_amount`.
+    """
+    if on is None:
+        return datetime.now(timezone.utc).date()
+    return as_utc(on).date() if isinstance(on, datetime) else on
+
+
+def convert_minor(amount_minor, source, target, rate) -> int:
+    """Convert minor units of `source` at `rate` into minor units of `target`."""
+    value = Decimal(amount_minor) * Decimal(rate)
+    value = value.scaleb(money.exponent(target) - money.exponent(source))
+    return int(value.quantize(1, ROUND_HALF_UP))
+
+
+class RateCache(object):
+    """Rate series per currency pair, loaded on first use and kept for `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._series = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def _load(self, source, target):
+        series = self._series.get((source, target))
+        if series is None:
+            result = await ExchangeRate.aexecute(
+                select(ExchangeRate.rate_date, ExchangeRate.rate)
+                .where(ExchangeRate.base == source, ExchangeRate.quote == target)
+                .order_by(ExchangeRate.rate_date)
+            )
+            rows = result.all()
+            series = ([row.rate_date for row in rows], [row.rate for row in rows])
+            # Pairs without rates are rechecked sooner, so a fresh import shows up.
+            ttl = None if rows else min(self._series.ttl, MISSING_PAIR_TTL)
+            self._series.set((source, target), series, ttl=ttl)
+        return series
+
+    async def rate(self, source, target, on=None):
+        if source == target:
+            return Decimal(1)
+        on = _as_date(on)
+        dates, rates = await self._load(source, target)
+        index = bisect_right(dates, on)
+        if not index:
+            raise MissingRate(source, target, on)
+        return rates[index - 1]
+
+    async def convert(self, amount_minor, source, target, on=None) -> int:
+        if source == target:
+            return amount_minor
+        rate = await self.rate(source, target, on)
+        return convert_minor(amount_minor, source, target, rate)
+
+    def clear(self):
+        self._series.clear()
+
+    def stats(self) -> dict:
+        return self._series.stats()
+
+
+rate_cache = RateCache(maxsize=settings.RATE_CACHE_SIZE, ttl=settings.RATE_CACHE_TTL)
+registry.register_stats("rate_cache", rate_cache.stats, counters=("hits", "misses"))
+
+
+def _day(column, dialect_name):
+    if dialect_name == "postgresql":
+        return cast(func.timezone(literal_column("'UTC'"), column), Date)
+    return func.date(column)
+
+
+def rate_lookup(source, target, on, dialect_name):
+    """Scalar subquery: the latest `source` -> `target` rate on or before `on`."""
+    return (
+        select(ExchangeRate.rate)
+        .where(
+            ExchangeRate.base == source,
+            ExchangeRate.quote == target,
+            ExchangeRate.rate_date <= _day(on, dialect_name),
+        )
+        .order_by(ExchangeRate.rate_date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def converted_minor(amount_minor, currency, target, on, dialect_name):
+    """`amount_minor` of `currency` in minor units of `target`; NULL without a rate.
+
+    `target` is a currency code or a column, such as the owner's base currency.
+    """
+    if isinstance(target, str):
+        target = literal(target)
+    converted = (
+        amount_minor
+        * rate_lookup(currency, target, on, dialect_name)
+        * money.scale_expression(target)
+        / money.scale_expression(currency)
+    )
+    return case(
+        (currency == target, amount_minor),
+        else_=cast(func.round(converted), BigInteger),
+    )
+
+
+def expense_amount(currency, dialect_name):
+    """`Expense.amount_minor` in minor units of `currency`, at the expense's date."""
+    expense = expense_model.Expense
+    return converted_minor(
+        expense.amount_minor,
+        expense.currency,
+        currency,
+        func.coalesce(expense.payment_date, expense.created_at),
+        dialect_name,
+    )
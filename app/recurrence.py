@@ -0,0 +1,218 @@
+"""Materialize recurring expenses from their recurrence rules.
+
+`materialize_due` claims a batch of due rules with ``SELECT ... FOR UPDATE
+SKIP LOCKED``, so several app replicas or workers can run it at once and
+each rule is handled by one of them. Every occurrence is inserted with an
+idempotency key (rule id and occurrence index), which is unique on the
+expense table, so a retried batch never duplicates an expense. The app runs
+`run_scheduler` as a background task; scripts/recurring_worker.py runs it
+standalone.
+"""
+import asyncio
+import calendar
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+from app import rates, rollups
+from app.cache import response_cache
+from app.config import settings
+from app.models import expense_model
+from app.models.recurrence_model import FrequencyEnum, RecurrenceRule
+from db import async_session_scope, get_async_session
+
+logger = logging.getLogger(__name__)
+
+_TEMPLATE_FIELDS = (
+    "name",
+    "paid_by",
+    "amount_minor",
+    "currency",
+    "is_spend",
+    "category_id",
+    "other_details",
+)
+
+
+def occurrence(starts_at, frequency, interval, index):
+    """Date of occurrence `index`; month ends clamp (Jan 31 -> Feb 28 -> Mar 31)."""
+    frequency = FrequencyEnum(frequency)
+    if frequency is FrequencyEnum.daily:
+        return starts_at + timedelta(days=interval * index)
+    if frequency is FrequencyEnum.weekly:
+        return starts_at + timedelta(weeks=interval * index)
+    months = interval * index * (12 if frequency is FrequencyEnum.yearly else 1)
+    year, month = divmod(starts_at.month - 1 + months, 12)
+    year += starts_at.year
+    day = min(starts_at.day, calendar.monthrange(year, month + 1)[1])
+    return starts_at.replace(year=year, month=month + 1, day=day)
+
+
+def idempotency_key(rule_id, index):
+    return "recurrence:%s:%s" % (rule_id, index)
+
+
+def align(value, like):
+    """`value` in UTC, naive when `like` is (SQLite drops the zone)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    elif like.tzinfo is not None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value if like.tzinfo else value.replace(tzinfo=None)
+
+
+def rule_dict(rule):
+    return {
+        "id": rule.id,
+        "template_expense_id": rule.template_expense_id,
+        "frequency": FrequencyEnum(rule.frequency).value,
+        "interval": rule.interval,
+        "starts_at": rule.starts_at,
+        "ends_at": rule.ends_at,
+        "next_run_at": rule.next_run_at,
+        "active": rule.active,
+    }
+
+
+def _due_occurrences(rule, limit):
+    """Indexes and dates of the rule's occurrences that are due, at most `limit`."""
+    due = []
+    index = rule.occurrences
+    when = occurrence(rule.starts_at, rule.frequency, rule.interval, index)
+    now = align(datetime.now(timezone.utc), when)
+    while when <= now and len(due) < limit:
+        if rule.ends_at is not None and when > rule.ends_at:
+            break
+        due.append((index, when))
+        index += 1
+        when = occurrence(rule.starts_at, rule.frequency, rule.interval, index)
+    return due
+
+
+async def materialize_due(batch_size=None):
+    """Create the due expenses of up to `batch_size` rules; returns how many were created."""
+    batch_size = batch_size or settings.RECURRENCE_BATCH_SIZE
+    db = get_async_session()
+    expense = expense_model.Expense
+    result = await db.execute(
+        select(RecurrenceRule, *(getattr(expense, f) for f in _TEMPLATE_FIELDS))
+        .join(expense, expense.id == RecurrenceRule.template_expense_id)
+        .where(RecurrenceRule.active, RecurrenceRule.next_run_at <= func.now())
+        .order_by(RecurrenceRule.next_run_at)
+        .limit(batch_size)
+        .with_for_update(of=RecurrenceRule, skip_locked=True)
+    )
+    claimed = result.all()
+    if not claimed:
+        return 0
+
+    owner_ids = {row.RecurrenceRule.created_by_id for row in claimed}
+    base_currencies = dict(
+        (
+            await db.execute(
+                select(expense_model.User.id, expense_model.User.base_currency).where(
+                    expense_model.User.id.in_(owner_ids)
+                )
+            )
+        ).all()
+    )
+    rows = []
+    entries = defaultdict(list)
+    for row in claimed:
+        rule = row.RecurrenceRule
+        template = {field: getattr(row, field) for field in _TEMPLATE_FIELDS}
+        owner_id = rule.created_by_id
+        due = _due_occurrences(rule, batch_size)
+        try:
+            for _, when in due:
+                await rates.rate_cache.rate(
+                    template["currency"], base_currencies[owner_id], when
+                )
+        except rates.MissingRate as e:
+            # Retry later so the rule doesn't keep its place at the head of
+            # every claim; the occurrence dates still come from `occurrences`.
+            retry_at = datetime.now(timezone.utc) + timedelta(
+                seconds=settings.RECURRENCE_RETRY_DELAY
+            )
+            rule.next_run_at = align(retry_at, rule.next_run_at)
+            logger.warning(
+                "Skipping recurrence rule %s until %s: %s", rule.id, retry_at, e
+            )
+            continue
+        for index, when in due:
+            rows.append(
+                dict(
+                    template,
+                    payment_date=when,
+                    recurrence_rule_id=rule.id,
+                    idempotency_key=idempotency_key(rule.id, index),
+                    created_by_id=owner_id,
+                )
+            )
+        if due:
+            rule.occurrences = due[-1][0] + 1
+            rule.next_run_at = occurrence(
+                rule.starts_at, rule.frequency, rule.interval, rule.occurrences
+            )
+        if rule.ends_at is not None and rule.next_run_at > rule.ends_at:
+            rule.active = False
+
+    if rows:
+        existing = set(
+            (
+                await db.execute(
+                    select(expense.idempotency_key).where(
+                        expense.idempotency_key.in_(
+                            [row["idempotency_key"] for row in rows]
+                        )
+                    )
+                )
+            ).scalars()
+        )
+        rows = [row for row in rows if row["idempotency_key"] not in existing]
+    if rows:
+        for row in rows:
+            entries[row["created_by_id"]].append(
+                (
+                    row["created_by_id"],
+                    row["category_id"],
+                    row["payment_date"],
+                    row["amount_minor"],
+                    row["is_spend"],
+                    row["currency"],
+                )
+            )
+        await db.execute(insert(expense.__table__), rows)
+        for owner_id, added in entries.items():
+            await rollups.record(added=added, currency=base_currencies[owner_id])
+    await db.commit()
+    for owner_id in entries:
+        response_cache.bump(owner_id)
+    return len(rows)
+
+
+async def drain(batch_size=None):
+    """Run `materialize_due` batches, each in its own session, until one comes up short."""
+    batch_size = batch_size or settings.RECURRENCE_BATCH_SIZE
+    total = 0
+    while True:
+        async with async_session_scope():
+            created = await materialize_due(batch_size)
+        total += created
+        if created < batch_size:
+            return total
+
+
+async def run_scheduler(interval=None, batch_size=None):
+    """Materialize due occurrences every `interval` seconds until cancelled."""
+    interval = interval or settings.RECURRENCE_INTERVAL
+    while True:
+        try:
+            await drain(batch_size)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Materializing recurring expenses failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,206 @@
+"""Incremental maintenance of the expense rollup and user balance tables.
+
+Expense writes in the routers record signed deltas here inside the same
+transaction as the write, so dashboards read O(categories x months) rows.
+Totals are in each user's base currency, converted at the expense's date.
+`rebuild` recomputes both tables from the expense table for backfills.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import Date, case, cast, delete, func, insert, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import money, rates
+from app.cache import response_cache
+from app.models import expense_model
+from app.models.rollup_model import ExpenseRollup, UserBalance
+from app.models.user_model import User
+from app.utils import as_utc
+from db import get_async_session
+
+
+def month_of(payment_date):
+    """The UTC month of `payment_date`, matching `date_bucket` in `rebuild`."""
+    return as_utc(payment_date or datetime.now(timezone.utc)).date().replace(day=1)
+
+
+_SQLITE_BUCKETS = {
+    "day": (),
+    "week": ("weekday 0", "-6 days"),
+    "month": ("start of month",),
+}
+
+
+def date_bucket(column, unit, dialect_name):
+    """Truncate `column` to the start of its UTC day, ISO week or month as a DATE."""
+    if dialect_name == "postgresql":
+        utc = func.timezone(literal_column("'UTC'"), column)
+        return cast(func.date_trunc(literal_column("'%s'" % unit), utc), Date)
+    return func.date(column, *_SQLITE_BUCKETS[unit])
+
+
+def expense_entry(user_id, expense, created_at=None):
+    """The rollup-relevant fields of an Expense or an expense payload.
+
+    An undated expense counts at its `created_at`, as in `rebuild`; pass the
+    value a payload will be inserted with.
+    """
+    currency = expense.currency or money.DEFAULT_CURRENCY
+    return (
+        user_id,
+        expense.category_id,
+        expense.payment_date or getattr(expense, "created_at", None) or created_at,
+        money.to_minor(expense.amount, currency),
+        expense.is_spend,
+        currency,
+    )
+
+
+async def _in_currency(entries, currency):
+    """Entries with their amount converted to `currency` and the currency dropped."""
+    converted = []
+    for user_id, category_id, payment_date, amount, is_spend, source in entries:
+        amount = await rates.rate_cache.convert(amount, source, currency, payment_date)
+        converted.append((user_id, category_id, payment_date, amount, is_spend))
+    return converted
+
+
+def expense_deltas(added=(), removed=()):
+    """Signed deltas of entries whose amounts are minor units of one currency."""
+    rollups = defaultdict(lambda: [0, 0, 0])
+    balances = defaultdict(lambda: [0, 0, 0])
+    signed = [(1, entry) for entry in added] + [(-1, entry) for entry in removed]
+    for sign, (user_id, category_id, payment_date, amount, is_spend) in signed:
+        spend = -amount if is_spend else 0
+        income = 0 if is_spend else amount
+        targets = [balances[user_id]]
+        if category_id is not None:
+            targets.append(rollups[(user_id, category_id, month_of(payment_date))])
+        for totals in targets:
+            totals[0] += sign * spend
+            totals[1] += sign * income
+            totals[2] += sign
+    return rollups, balances
+
+
+def upsert_increment(
+    dialect_name, table, rows, index_elements, columns=("spend", "income", "count")
+):
+    """INSERT `rows`, adding `columns` onto any row that already has the same key."""
+    insert_ = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert_(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            column: table.c[column] + statement.excluded[column] for column in columns
+        },
+    )
+
+
+async def record(added=(), removed=(), currency=None):
+    """Apply added and removed expense entries to the rollups in the current transaction.
+
+    Totals are kept in the owner's base `currency`; an entry in a currency
+    without a known rate raises `rates.MissingRate`.
+    """
+    currency = currency or money.DEFAULT_CURRENCY
+    rollups, balances = expense_deltas(
+        await _in_currency(added, currency), await _in_currency(removed, currency)
+    )
+    db = get_async_session()
+    dialect_name = db.bind.dialect.name
+    if rollups:
+        await db.execute(
+            upsert_increment(
+                dialect_name,
+                ExpenseRollup.__table__,
+                [
+                    {
+                        "user_id": user_id,
+                        "category_id": category_id,
+                        "month": month,
+                        "spend": spend,
+                        "income": income,
+                        "count": count,
+                    }
+                    for (user_id, category_id, month), (
+                        spend,
+                        income,
+                        count,
+                    ) in rollups.items()
+                ],
+                ["user_id", "category_id", "month"],
+            )
+        )
+    if balances:
+        await db.execute(
+            upsert_increment(
+                dialect_name,
+                UserBalance.__table__,
+                [
+                    {
+                        "user_id": user_id,
+                        "spend": spend,
+                        "income": income,
+                        "count": count,
+                    }
+                    for user_id, (spend, income, count) in balances.items()
+                ],
+                ["user_id"],
+            )
+        )
+
+
+def rebuild(db, user_id=None):
+    """Recompute rollups and balances from scratch, for everyone or one user."""
+    expense = expense_model.Expense
+    filters = [expense.created_by_id.isnot(None)]
+    if user_id is not None:
+        filters.append(expense.created_by_id == user_id)
+    for model in (ExpenseRollup, UserBalance):
+        statement = delete(model)
+        if user_id is not None:
+            statement = statement.where(model.user_id == user_id)
+        db.execute(statement)
+
+    amount = rates.expense_amount(User.base_currency, db.bind.dialect.name)
+    spend = func.sum(case((expense.is_spend, -amount), else_=0))
+    income = func.sum(case((expense.is_spend, 0), else_=amount))
+    month = date_bucket(
+        func.coalesce(expense.payment_date, expense.created_at),
+        "month",
+        db.bind.dialect.name,
+    )
+    columns = ["user_id", "spend", "income", "count"]
+    db.execute(
+        insert(ExpenseRollup.__table__).from_select(
+            ["category_id", "month"] + columns,
+            select(
+                expense.category_id,
+                month,
+                expense.created_by_id,
+                spend,
+                income,
+                func.count(),
+            )
+            .join(User, User.id == expense.created_by_id)
+            .where(*filters, expense.category_id.isnot(None))
+            .group_by(expense.created_by_id, expense.category_id, month),
+        )
+    )
+    db.execute(
+        insert(UserBalance.__table__).from_select(
+            columns,
+            select(expense.created_by_id, spend, income, func.count())
+            .join(User, User.id == expense.created_by_id)
+            .where(*filters)
+            .group_by(expense.created_by_id),
+        )
+    )
+    db.commit()
+    if user_id is not None:
+        response_cache.bump(user_id)
+        return
+    for balance_user_id in db.execute(select(UserBalance.user_id)).scalars():
+        response_cache.bump(balance_user_id)
@@ -2,7 +2,7 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
-from app import oauth2, schemas, utils
+from app import money, oauth2, schemas, utils
 from app.config import settings
 from app.models.expense_model import User
 from app.oauth2 import AuthJWT
@@ -17,12 +17,12 @@ REFRESH_TOKEN_EXPIRES_IN = settings.REFRESH_TOKEN_EXPIRES_IN
     summary="Create new user",
     status_code=status.HTTP_201_CREATED,
 )
-def create_user(
+async def create_user(
     payload: schemas.CreateUserSchema,
     response: Response,
     Authorize: AuthJWT = Depends(),
 ):
-    user = User.get_by(email=payload.email.lower())
+    user = await User.aget_by(email=payload.email.lower())
     if user is not None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -32,10 +32,11 @@ def create_user(
         "first_name": payload.first_name,
         "last_name": payload.last_name,
         "email": payload.email,
-        "hashed_password": utils.get_hashed_password(payload.password),
+        "base_currency": payload.base_currency or money.DEFAULT_CURRENCY,
+        "hashed_password": await utils.hash_password_async(payload.password),
     }
 
-    user = User.create(**user)
+    user = await User.acreate(**user)
 
     access_token = Authorize.create_access_token(
         subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN)
@@ -82,21 +83,26 @@ def create_user(
     summary="Create access and refresh tokens for user",
     status_code=status.HTTP_200_OK,
 )
-def login(
+async def login(
     payload: schemas.LoginUserSchema, response: Response, Authorize: AuthJWT = Depends()
 ):
-    user = User.get_by(email=payload.email)
+    user = await User.aget_by(email=payload.email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password",
         )
 
-    hashed_pass = user.hashed_password
-    if not utils.verify_password(payload.password, hashed_pass):
+    valid, new_hash = await utils.verify_and_update_password_async(
+        payload.password, user.hashed_password
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await user.asave()
 
     access_token = Authorize.create_access_token(
         subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN)
@@ -1,10 +1,205 @@
-from fastapi import APIRouter, HTTPException, Request, status
-from sqlalchemy import and_
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Literal, Union
 
-from ..models import expense_model
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from sqlalchemy import (
+    Date,
+    DateTime,
+    and_,
+    case,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+    true,
+)
+
+from db import get_async_session
+
+from .. import money, rates
+from ..cache import cached_response
+from ..models import expense_model, rollup_model
+from ..rollups import date_bucket
+from ..utils import as_utc
 
 router = APIRouter()
 
+DEFAULT_WINDOWS = {
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=26),
+    "month": timedelta(days=365),
+}
+MAX_PERIODS = 1000
+
+
+def category_expense_statement(
+    user_id,
+    date_from=None,
+    date_to=None,
+    paid_by=None,
+    currency=money.DEFAULT_CURRENCY,
+    dialect_name="postgresql",
+):
+    filters = [expense_model.Expense.created_by_id == user_id]
+    if date_from:
+        filters.append(expense_model.Expense.payment_date >= date_from)
+    if date_to:
+        filters.append(expense_model.Expense.payment_date <= date_to)
+    if paid_by:
+        filters.append(expense_model.Expense.paid_by == paid_by)
+
+    total = func.sum(func.abs(rates.expense_amount(currency, dialect_name)))
+    return (
+        select(expense_model.ExpenseCategory.name, total)
+        .join(
+            expense_model.ExpenseCategory,
+            expense_model.Expense.category_id == expense_model.ExpenseCategory.id,
+        )
+        .where(*filters)
+        .group_by(expense_model.Expense.category_id, expense_model.ExpenseCategory.name)
+        .order_by(total.desc())
+    )
+
+
+def category_rollup_statement(user_id):
+    total = func.sum(
+        rollup_model.ExpenseRollup.spend + rollup_model.ExpenseRollup.income
+    )
+    return (
+        select(expense_model.ExpenseCategory.name, total)
+        .join(
+            expense_model.ExpenseCategory,
+            rollup_model.ExpenseRollup.category_id == expense_model.ExpenseCategory.id,
+        )
+        .where(rollup_model.ExpenseRollup.user_id == user_id)
+        .group_by(
+            rollup_model.ExpenseRollup.category_id, expense_model.ExpenseCategory.name
+        )
+        .having(func.sum(rollup_model.ExpenseRollup.count) > 0)
+        .order_by(total.desc())
+    )
+
+
+def _periods(start, end, bucket):
+    """Bucket start dates covering the UTC range [start, end], mirroring `date_bucket`."""
+    period = start.date()
+    if bucket == "week":
+        period -= timedelta(days=period.weekday())
+    elif bucket == "month":
+        period = period.replace(day=1)
+    periods = []
+    while period <= end.date() and len(periods) <= MAX_PERIODS:
+        periods.append(period)
+        if bucket == "month":
+            period = (period + timedelta(days=32)).replace(day=1)
+        else:
+            period += timedelta(days=7 if bucket == "week" else 1)
+    return periods
+
+
+def _utc_timestamp(value):
+    """`value` as a UTC timestamp without time zone, as `date_bucket` truncates."""
+    return func.timezone(
+        literal_column("'UTC'"), cast(literal(value), DateTime(timezone=True))
+    )
+
+
+def timeseries_statement(
+    user_id,
+    bucket,
+    date_from,
+    date_to,
+    dialect_name,
+    breakdown=None,
+    category_id=None,
+    paid_by=None,
+    currency=money.DEFAULT_CURRENCY,
+):
+    """Spend and income per (period, key) in `currency`; Postgres also gap-fills
+    empty periods."""
+    if breakdown == "category":
+        key = expense_model.ExpenseCategory.name
+    elif breakdown == "paid_by":
+        key = expense_model.Expense.paid_by
+    else:
+        key = literal_column("'total'")
+    period = date_bucket(expense_model.Expense.payment_date, bucket, dialect_name)
+    filters = [
+        expense_model.Expense.created_by_id == user_id,
+        expense_model.Expense.payment_date >= date_from,
+        expense_model.Expense.payment_date < date_to,
+    ]
+    if category_id:
+        filters.append(expense_model.Expense.category_id == category_id)
+    if paid_by:
+        filters.append(expense_model.Expense.paid_by == paid_by)
+    amount = rates.expense_amount(currency, dialect_name)
+
+    aggregate = (
+        select(
+            period.label("period"),
+            key.label("key"),
+            func.sum(
+                case(
+                    (expense_model.Expense.is_spend, -amount),
+                    else_=0,
+                )
+            ).label("spend"),
+            func.sum(
+                case(
+                    (expense_model.Expense.is_spend, 0),
+                    else_=amount,
+                )
+            ).label("income"),
+        )
+        .select_from(expense_model.Expense)
+        .outerjoin(
+            expense_model.ExpenseCategory,
+            expense_model.Expense.category_id == expense_model.ExpenseCategory.id,
+        )
+        .where(*filters)
+        .group_by(period, key)
+    )
+    if dialect_name != "postgresql":
+        return aggregate.order_by(literal_column("key"), literal_column("period"))
+
+    aggregate = aggregate.cte("aggregate")
+    periods = select(
+        cast(
+            func.generate_series(
+                func.date_trunc(
+                    literal_column("'%s'" % bucket), _utc_timestamp(date_from)
+                ),
+                _utc_timestamp(date_to - timedelta(microseconds=1)),
+                literal_column("interval '1 %s'" % bucket),
+            ),
+            Date,
+        ).label("period")
+    ).subquery()
+    if breakdown:
+        keys = select(aggregate.c.key).distinct().subquery()
+    else:
+        keys = select(literal_column("'total'").label("key")).subquery()
+    return (
+        select(
+            periods.c.period,
+            keys.c.key,
+            func.coalesce(aggregate.c.spend, 0),
+            func.coalesce(aggregate.c.income, 0),
+        )
+        .select_from(
+            periods.join(keys, true()).outerjoin(
+                aggregate,
+                and_(
+                    aggregate.c.period == periods.c.period,
+                    aggregate.c.key == keys.c.key,
+                ),
+            )
+        )
+        .order_by(keys.c.key, periods.c.period)
+    )
+
 
 @router.get(
     "/category_expense",
@@ -12,25 +207,144 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     # response_model=schemas.ExpenseCategory,
 )
-def get_category_expense(
+@cached_response
+async def get_category_expense(
     request: Request,
+    date_from: Union[datetime, None] = Query(None, alias="from"),
+    date_to: Union[datetime, None] = Query(None, alias="to"),
+    paid_by: Union[Literal["Bank", "Card", "Cash"], None] = None,
 ):
+    currency = request.state.user["base_currency"]
     try:
-        category_expense = {}
-        expenses = (
-            expense_model.Expense.query()
-            .filter(expense_model.Expense.created_by_id == request.state.user_id)
-            .all()
-        )
-        for expense in expenses:
-            category_expense[expense.category.name] = category_expense.get(
-                expense.category.name, 0
-            ) + abs(expense.amount)
+        if date_from or date_to or paid_by:
+            statement = category_expense_statement(
+                request.state.user_id,
+                date_from,
+                date_to,
+                paid_by,
+                currency,
+                get_async_session().bind.dialect.name,
+            )
+        else:
+            statement = category_rollup_statement(request.state.user_id)
+        result = await expense_model.Expense.aexecute(statement)
         category_expense = [["Category", "Amount"]] + [
-            [k, v] for k, v in category_expense.items()
+            [name, money.to_float(amount, currency)] for name, amount in result.all()
         ]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
     return category_expense
+
+
+@router.get(
+    "/balance",
+    summary="Get the running income, spend and balance",
+    status_code=status.HTTP_200_OK,
+)
+@cached_response
+async def get_balance(
+    request: Request,
+):
+    try:
+        balance = await rollup_model.UserBalance.aget_by(user_id=request.state.user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    currency = request.state.user["base_currency"]
+    income = balance.income if balance else 0
+    spend = balance.spend if balance else 0
+    return {
+        "currency": currency,
+        "income": money.to_float(income, currency),
+        "spend": money.to_float(spend, currency),
+        "balance": money.to_float(income - spend, currency),
+        "count": balance.count if balance else 0,
+    }
+
+
+@router.get(
+    "/timeseries",
+    summary="Get spend and income per day, week or month",
+    status_code=status.HTTP_200_OK,
+)
+@cached_response
+async def get_timeseries(
+    request: Request,
+    bucket: Literal["day", "week", "month"] = "month",
+    date_from: Union[datetime, None] = Query(None, alias="from"),
+    date_to: Union[datetime, None] = Query(None, alias="to"),
+    breakdown: Union[Literal["category", "paid_by"], None] = None,
+    category_id: Union[int, None] = None,
+    paid_by: Union[Literal["Bank", "Card", "Cash"], None] = None,
+):
+    # Naive bounds are taken as UTC, and periods are UTC days, weeks or months.
+    date_to = as_utc(
+        date_to
+        or datetime.combine(
+            datetime.now(timezone.utc).date() + timedelta(days=1), time()
+        )
+    )
+    date_from = as_utc(date_from or date_to - DEFAULT_WINDOWS[bucket])
+    if date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be before 'to'.",
+        )
+    periods = _periods(date_from, date_to - timedelta(microseconds=1), bucket)
+    if len(periods) > MAX_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The range must cover between 1 and {MAX_PERIODS} {bucket}s.",
+        )
+
+    dialect_name = get_async_session().bind.dialect.name
+    currency = request.state.user["base_currency"]
+    try:
+        result = await expense_model.Expense.aexecute(
+            timeseries_statement(
+                request.state.user_id,
+                bucket,
+                date_from,
+                date_to,
+                dialect_name,
+                breakdown,
+                category_id,
+                paid_by,
+                currency,
+            )
+        )
+        series = {}
+        for period, key, spend, income in result.all():
+            if isinstance(period, datetime):
+                period = period.date()
+            elif isinstance(period, str):
+                period = date.fromisoformat(period)
+            points = series.setdefault(getattr(key, "value", key), {})
+            points[period] = {
+                "period": period,
+                "spend": money.to_float(spend, currency),
+                "income": money.to_float(income, currency),
+            }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+    if not breakdown:
+        series.setdefault("total", {})
+    return {
+        "bucket": bucket,
+        "currency": currency,
+        "from": date_from,
+        "to": date_to,
+        "series": {
+            key: [
+                points.get(period) or {"period": period, "spend": 0.0, "income": 0.0}
+                for period in periods
+            ]
+            for key, points in series.items()
+        },
+    }
@@ -1,26 +1,152 @@
-from typing import Dict, List, Union
+import base64
+import csv
+import functools
+import io
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Literal, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import String, and_, bindparam, func, or_, select
+from sqlalchemy.orm import load_only, raiseload
 
-from .. import schemas
+from db import get_async_session
+
+from .. import money, rates, rollups, schemas, serializers
+from ..cache import cached_response
+from ..config import settings
 from ..models import expense_model
+from ..models.recurrence_model import RecurrenceRule
+from ..recurrence import align, occurrence, rule_dict
+from ..search import search_expenses
 
 router = APIRouter()
 
 
+def _encode_cursor(expense):
+    payment_date = expense.payment_date.isoformat() if expense.payment_date else None
+    raw = json.dumps([payment_date, expense.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        payment_date, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(payment_date) if payment_date else None), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+def _after_cursor(null_date):
+    """Keyset condition for rows after the `cursor_date`/`cursor_id` parameters
+    in (payment_date DESC NULLS LAST, id DESC)."""
+    after_id = expense_model.Expense.id < bindparam("cursor_id")
+    if null_date:
+        return and_(expense_model.Expense.payment_date.is_(None), after_id)
+    return or_(
+        expense_model.Expense.payment_date < bindparam("cursor_date"),
+        and_(expense_model.Expense.payment_date == bindparam("cursor_date"), after_id),
+        expense_model.Expense.payment_date.is_(None),
+    )
+
+
+def _amount_in_base_currency(dialect_name):
+    """The expense amount in minor units of the `base_currency` parameter.
+
+    Amount bounds are given in the user's base currency, like the charts;
+    rows without a rate to it never match.
+    """
+    return rates.expense_amount(bindparam("base_currency", type_=String), dialect_name)
+
+
+# Listing filters by name, each built for a dialect. Each clause reads its
+# value from the bind parameter of the same name, so a statement only
+# depends on which filters are active and can be reused for any values.
+EXPENSE_FILTERS = {
+    "category_id": lambda dialect_name: expense_model.Expense.category_id.in_(
+        bindparam("category_id", expanding=True)
+    ),
+    "paid_by": lambda dialect_name: expense_model.Expense.paid_by.in_(
+        bindparam("paid_by", expanding=True)
+    ),
+    "date_from": lambda dialect_name: expense_model.Expense.payment_date
+    >= bindparam("date_from"),
+    "date_to": lambda dialect_name: expense_model.Expense.payment_date
+    <= bindparam("date_to"),
+    "is_spend": lambda dialect_name: expense_model.Expense.is_spend
+    == bindparam("is_spend"),
+    "amount_min": lambda dialect_name: _amount_in_base_currency(dialect_name)
+    >= bindparam("amount_min"),
+    "amount_max": lambda dialect_name: _amount_in_base_currency(dialect_name)
+    <= bindparam("amount_max"),
+    "cursor": lambda dialect_name: _after_cursor(False),
+    "cursor_null": lambda dialect_name: _after_cursor(True),
+}
+
+
+def category_list_statement(user_id):
+    return (
+        select(expense_model.ExpenseCategory.name, expense_model.ExpenseCategory.id)
+        .where(expense_model.ExpenseCategory.created_by_id == user_id)
+        .order_by(expense_model.ExpenseCategory.created_at.desc())
+    )
+
+
+def expense_list_statement(user_id, *filters):
+    return (
+        select(*serializers.expense_columns())
+        .select_from(expense_model.Expense)
+        .outerjoin(
+            expense_model.ExpenseCategory,
+            expense_model.Expense.category_id == expense_model.ExpenseCategory.id,
+        )
+        .where(*filters)
+        .where(expense_model.Expense.created_by_id == user_id)
+        .order_by(
+            expense_model.Expense.payment_date.desc().nullslast(),
+            expense_model.Expense.id.desc(),
+        )
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def filtered_expense_statement(shape, limited=False, dialect_name="postgresql"):
+    """Expense listing for the `EXPENSE_FILTERS` named in `shape`.
+
+    Built once per shape and dialect; the user, filter values and `limit`
+    are bound at execution time.
+    """
+    statement = expense_list_statement(
+        bindparam("user_id"), *(EXPENSE_FILTERS[name](dialect_name) for name in shape)
+    )
+    if limited:
+        statement = statement.limit(bindparam("limit"))
+    return statement
+
+
+async def _stream_expenses(statement, params=None):
+    rows = await expense_model.Expense.astream(statement, params=params)
+    async for row in rows:
+        yield serializers.dumps(serializers.expense_row_to_dict(row)) + b"\n"
+
+
 @router.post(
     "/category",
     summary="Creates a new expense category",
     status_code=status.HTTP_201_CREATED,
 )
-def create_category(
+async def create_category(
     request: Request,
     payload: schemas.CreateExpenseCategory,
 ):
     try:
-        category = expense_model.ExpenseCategory.create(**payload.dict())
+        category = await expense_model.ExpenseCategory.acreate(**payload.dict())
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -34,23 +160,20 @@ def create_category(
     status_code=status.HTTP_200_OK,
     response_model=List[schemas.ExpenseCategory],
 )
-def get_categories(
+@cached_response
+async def get_categories(
     request: Request,
 ):
     try:
-        categories = (
-            expense_model.ExpenseCategory.query()
-            .filter(
-                expense_model.ExpenseCategory.created_by_id == request.state.user_id
-            )
-            .order_by(expense_model.ExpenseCategory.created_at.desc())
-            .all()
+        result = await expense_model.ExpenseCategory.aexecute(
+            category_list_statement(request.state.user_id)
         )
+        categories = [dict(row) for row in result.mappings()]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    return categories
+    return serializers.json_response(categories)
 
 
 @router.get(
@@ -59,13 +182,13 @@ def get_categories(
     status_code=status.HTTP_200_OK,
     response_model=schemas.ExpenseCategory,
 )
-def get_category(
+async def get_category(
     request: Request,
-    id,
+    id: int,
 ):
     try:
-        category = expense_model.ExpenseCategory.get_by(
-            id=id, created_by_id=request.state.user_id
+        category = await expense_model.ExpenseCategory.aget_by(
+            raiseload("*"), id=id, created_by_id=request.state.user_id
         )
     except Exception as e:
         raise HTTPException(
@@ -79,18 +202,22 @@ def get_category(
     summary="delete a category",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_category(
+async def delete_category(
     request: Request,
-    id,
+    id: int,
 ):
-    expense = expense_model.Expense.get_by(category_id=id)
+    expense = await expense_model.Expense.aget_by(
+        load_only(expense_model.Expense.id, expense_model.Expense.name),
+        raiseload("*"),
+        category_id=id,
+    )
     if expense:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Category is referenced by expense {expense.name}",
         )
-    category = expense_model.ExpenseCategory.get_by(
-        id=id, created_by_id=request.state.user_id
+    category = await expense_model.ExpenseCategory.aget_by(
+        raiseload("*"), id=id, created_by_id=request.state.user_id
     )
     if not category:
         raise HTTPException(
@@ -98,7 +225,7 @@ def delete_category(
             detail="Category not found.",
         )
     try:
-        category.delete()
+        await category.adelete()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -112,13 +239,13 @@ def delete_category(
     status_code=status.HTTP_200_OK,
     response_model=schemas.ExpenseCategory,
 )
-def update_category(
+async def update_category(
     request: Request,
-    id,
+    id: int,
     payload: schemas.CreateExpenseCategory,
 ):
-    category = expense_model.ExpenseCategory.get_by(
-        id=id, created_by_id=request.state.user_id
+    category = await expense_model.ExpenseCategory.aget_by(
+        raiseload("*"), id=id, created_by_id=request.state.user_id
     )
     if not category:
         raise HTTPException(
@@ -127,7 +254,7 @@ def update_category(
         )
     try:
         category.name = payload.name
-        category.save()
+        await category.asave()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -140,18 +267,207 @@ def update_category(
     summary="Creates a new expense",
     status_code=status.HTTP_201_CREATED,
 )
-def create_expense(
+async def create_expense(
     request: Request,
     payload: schemas.CreateExpense,
 ):
+    base_currency = request.state.user["base_currency"]
     try:
         payload.amount = (0 - payload.amount) if payload.is_spend else payload.amount
-        expense = expense_model.Expense.create(**payload.dict())
+        payload.currency = payload.currency or base_currency
+        created_at = datetime.now(timezone.utc)
+        await rollups.record(
+            added=[rollups.expense_entry(request.state.user_id, payload, created_at)],
+            currency=base_currency,
+        )
+        expense = await expense_model.Expense.acreate(
+            **payload.dict(exclude={"amount"}),
+            amount_minor=money.to_minor(payload.amount, payload.currency),
+            created_at=created_at,
+        )
+    except rates.MissingRate as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    return expense
+    return serializers.expense_to_dict(expense)
+
+
+async def _read_bulk_rows(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload the CSV as the 'file' form field.",
+            )
+        content = await upload.read()
+    elif content_type.startswith("text/csv"):
+        content = await request.body()
+    else:
+        try:
+            rows = await request.json()
+        except ValueError:
+            rows = None
+        if not isinstance(rows, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a JSON array of expenses or a CSV upload.",
+            )
+        return rows
+
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV uploads must be UTF-8 encoded.",
+        )
+    reader = csv.DictReader(io.StringIO(text))
+    return [{k: v for k, v in row.items() if v not in ("", None)} for row in reader]
+
+
+@router.post(
+    "/bulk",
+    summary="Creates expenses in bulk from a JSON array or a CSV upload",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/CreateExpense"},
+                    }
+                },
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                },
+            },
+            "required": True,
+        }
+    },
+)
+async def create_expenses_bulk(
+    request: Request,
+):
+    rows = await _read_bulk_rows(request)
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_IMPORT_MAX_ROWS} expenses per import.",
+        )
+
+    errors = []
+    payloads = []
+    for index, row in enumerate(rows):
+        try:
+            payloads.append((index, schemas.CreateExpense.parse_obj(row)))
+        except ValidationError as e:
+            errors.append({"row": index, "errors": e.errors()})
+
+    category_ids = {payload.category_id for _, payload in payloads}
+    owned_category_ids = set()
+    if category_ids:
+        owned_category_ids = set(
+            await expense_model.ExpenseCategory.ascalars(
+                select(expense_model.ExpenseCategory.id).where(
+                    expense_model.ExpenseCategory.id.in_(category_ids),
+                    expense_model.ExpenseCategory.created_by_id
+                    == request.state.user_id,
+                )
+            )
+        )
+
+    base_currency = request.state.user["base_currency"]
+    created_at = datetime.now(timezone.utc)
+    expenses = []
+    for index, payload in payloads:
+        currency = payload.currency or base_currency
+        try:
+            await rates.rate_cache.rate(
+                currency, base_currency, payload.payment_date or created_at
+            )
+        except rates.MissingRate as e:
+            errors.append(
+                {
+                    "row": index,
+                    "errors": [
+                        {
+                            "loc": ["currency"],
+                            "msg": str(e),
+                            "type": "value_error.missing_rate",
+                        }
+                    ],
+                }
+            )
+            continue
+        if payload.category_id not in owned_category_ids:
+            errors.append(
+                {
+                    "row": index,
+                    "errors": [
+                        {
+                            "loc": ["category_id"],
+                            "msg": "category not found",
+                            "type": "value_error.not_found",
+                        }
+                    ],
+                }
+            )
+            continue
+        is_spend = True if payload.is_spend is None else payload.is_spend
+        expenses.append(
+            {
+                "name": payload.name,
+                "paid_by": payload.paid_by or expense_model.PaidByEnum.Cash.value,
+                "amount_minor": money.to_minor(
+                    (0 - payload.amount) if is_spend else payload.amount, currency
+                ),
+                "currency": currency,
+                "is_spend": is_spend,
+                "category_id": payload.category_id,
+                "payment_date": payload.payment_date,
+                "other_details": payload.other_details,
+                "created_at": created_at,
+                "created_by_id": request.state.user_id,
+            }
+        )
+
+    if expenses:
+        try:
+            await rollups.record(
+                added=[
+                    (
+                        row["created_by_id"],
+                        row["category_id"],
+                        row["payment_date"] or created_at,
+                        row["amount_minor"],
+                        row["is_spend"],
+                        row["currency"],
+                    )
+                    for row in expenses
+                ],
+                currency=base_currency,
+            )
+            await expense_model.Expense.abulk_insert(
+                expenses, batch_size=settings.BULK_INSERT_BATCH_SIZE
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+    return {
+        "status": "success",
+        "inserted": len(expenses),
+        "errors": sorted(errors, key=lambda error: error["row"]),
+    }
 
 
 @router.get(
@@ -160,73 +476,121 @@ def create_expense(
     status_code=status.HTTP_200_OK,
     response_model=List[schemas.Expense],
 )
-def get_expenses(
+@cached_response
+async def get_expenses(
     request: Request,
+    category_id: Union[List[int], None] = Query(None),
+    paid_by: Union[List[Literal["Bank", "Card", "Cash"]], None] = Query(None),
+    date_from: Union[datetime, None] = Query(None, alias="from"),
+    date_to: Union[datetime, None] = Query(None, alias="to"),
+    is_spend: Union[bool, None] = None,
+    amount_min: Union[Decimal, None] = None,
+    amount_max: Union[Decimal, None] = None,
     type: Union[str, None] = None,
     value: Union[str, None] = None,
-    amount_gt: Union[int, None] = None,
-    amount_lt: Union[int, None] = None,
+    amount_gt: Union[Decimal, None] = None,
+    amount_lt: Union[Decimal, None] = None,
+    limit: Union[int, None] = Query(None, ge=1, le=1000),
+    cursor: Union[str, None] = None,
+    stream: bool = False,
 ):
     if type and type not in ["category", "paid_by"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid filter type. Must be of category, paid_by.",
         )
-    filters = []
-
+    category_id = list(category_id or [])
+    paid_by = list(paid_by or [])
+    # `type`/`value` and `amount_gt`/`amount_lt` are the older single-value
+    # spellings of the filters above.
     if type == "category":
-        category = expense_model.ExpenseCategory.get(value)
-        if category:
-            category_id = category.id
-        else:
+        if not (value and value.isdigit()):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No category found for the given filter",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Category filter value must be a category id.",
             )
-        filters.append(expense_model.Expense.category_id == category_id)
+        category_id.append(int(value))
     elif type == "paid_by":
-        filters.append(expense_model.Expense.paid_by == value)
+        if value not in expense_model.PaidByEnum.__members__:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Paid by filter value must be one of Bank, Card, Cash.",
+            )
+        paid_by.append(value)
 
-    if amount_gt and amount_lt:
-        filters.append(expense_model.Expense.amount >= amount_gt)
-        filters.append(expense_model.Expense.amount <= amount_lt)
-    elif amount_gt:
-        filters.append(expense_model.Expense.amount >= amount_gt)
-    elif amount_lt:
-        filters.append(expense_model.Expense.amount <= amount_lt)
+    params = {
+        "user_id": request.state.user_id,
+        "category_id": category_id or None,
+        "paid_by": paid_by or None,
+        "date_from": date_from,
+        "date_to": date_to,
+        "is_spend": is_spend,
+        "amount_min": amount_gt if amount_min is None else amount_min,
+        "amount_max": amount_lt if amount_max is None else amount_max,
+    }
+    base_currency = request.state.user["base_currency"]
+    for bound in ("amount_min", "amount_max"):
+        if params[bound] is not None:
+            params[bound] = money.to_minor(params[bound], base_currency)
+            params["base_currency"] = base_currency
+    params = {name: param for name, param in params.items() if param is not None}
+    shape = [name for name in EXPENSE_FILTERS if name in params]
+    if cursor:
+        params["cursor_date"], params["cursor_id"] = _decode_cursor(cursor)
+        shape.append("cursor_null" if params["cursor_date"] is None else "cursor")
+    statement = filtered_expense_statement(
+        tuple(shape),
+        limited=bool(limit),
+        dialect_name=get_async_session().bind.dialect.name,
+    )
 
-    try:
-        expenses = (
-            expense_model.Expense.query()
-            .filter(and_(el for el in filters))
-            .filter(expense_model.Expense.created_by_id == request.state.user_id)
-            .order_by(expense_model.Expense.payment_date.desc())
-            .all()
+    if stream:
+        if limit:
+            params["limit"] = limit
+        return StreamingResponse(
+            _stream_expenses(statement, params), media_type="application/x-ndjson"
         )
 
-        expenses = [jsonable_encoder(e) for e in expenses]
+    headers = {}
+    try:
+        if limit:
+            params["limit"] = limit + 1
+        rows = (await expense_model.Expense.aexecute(statement, params)).all()
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+
+        expenses = [serializers.expense_row_to_dict(row) for row in rows]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    return expenses
+    return serializers.json_response(expenses, headers=headers)
 
 
 @router.delete(
     "/{id}", summary="Delete an expense", status_code=status.HTTP_204_NO_CONTENT
 )
-def delete_expense(
+async def delete_expense(
     request: Request,
-    id,
+    id: int,
 ):
-    expense = expense_model.Expense.get_by(id=id, created_by_id=request.state.user_id)
+    expense = await expense_model.Expense.aget_for_update(
+        raiseload("*"), id=id, created_by_id=request.state.user_id
+    )
     if not expense:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expense not found.",
         )
     try:
-        expense.delete()
+        await rollups.record(
+            removed=[rollups.expense_entry(request.state.user_id, expense)],
+            currency=request.state.user["base_currency"],
+        )
+        await expense.adelete()
+    except rates.MissingRate as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -235,32 +599,140 @@ def delete_expense(
 
 
 @router.put("/{id}", summary="Update an expense", status_code=status.HTTP_200_OK)
-def update_expense(
+async def update_expense(
     request: Request,
-    id,
+    id: int,
     payload: schemas.CreateExpense,
 ):
-    expense = expense_model.Expense.get_by(id=id, created_by_id=request.state.user_id)
+    expense = await expense_model.Expense.aget_for_update(
+        raiseload("*"), id=id, created_by_id=request.state.user_id
+    )
     if not expense:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expense not found.",
         )
     try:
+        removed = [rollups.expense_entry(request.state.user_id, expense)]
         payload.amount = (0 - payload.amount) if payload.is_spend else payload.amount
         expense.name = payload.name
         expense.paid_by = payload.paid_by
+        expense.currency = payload.currency or expense.currency
         expense.amount = payload.amount
         expense.is_spend = payload.is_spend
         expense.payment_date = payload.payment_date
         expense.other_details = payload.other_details
         expense.category_id = payload.category_id
-        expense.save()
+        await rollups.record(
+            added=[rollups.expense_entry(request.state.user_id, expense)],
+            removed=removed,
+            currency=request.state.user["base_currency"],
+        )
+        await expense.asave()
+    except rates.MissingRate as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    return expense
+    return serializers.expense_to_dict(expense)
+
+
+def expense_group_statement(
+    user_id, by, limit=None, currency=money.DEFAULT_CURRENCY, dialect_name="postgresql"
+):
+    """Expenses ordered by their `by` bucket, with per-bucket count, total and rank.
+
+    Bucket totals are converted to `currency`.
+    """
+    key = (
+        expense_model.ExpenseCategory.name
+        if by == "category"
+        else expense_model.Expense.paid_by
+    )
+    inner = (
+        select(
+            key.label("group_key"),
+            expense_model.Expense.id,
+            expense_model.Expense.name,
+            expense_model.Expense.amount_minor,
+            expense_model.Expense.currency,
+            expense_model.Expense.paid_by,
+            expense_model.Expense.is_spend,
+            expense_model.Expense.payment_date,
+            expense_model.Expense.other_details,
+            expense_model.Expense.category_id,
+            expense_model.ExpenseCategory.name.label("category_name"),
+            func.count().over(partition_by=key).label("group_count"),
+            func.sum(rates.expense_amount(currency, dialect_name))
+            .over(partition_by=key)
+            .label("group_total"),
+            func.row_number()
+            .over(
+                partition_by=key,
+                order_by=(
+                    expense_model.Expense.payment_date.desc().nullslast(),
+                    expense_model.Expense.id.desc(),
+                ),
+            )
+            .label("group_rank"),
+        )
+        .select_from(expense_model.Expense)
+        .outerjoin(
+            expense_model.ExpenseCategory,
+            expense_model.Expense.category_id == expense_model.ExpenseCategory.id,
+        )
+        .where(expense_model.Expense.created_by_id == user_id, key.isnot(None))
+        .subquery()
+    )
+    statement = select(inner).order_by(inner.c.group_key, inner.c.group_rank)
+    if limit:
+        statement = statement.where(inner.c.group_rank <= limit)
+    return statement
+
+
+async def _group_expenses(user_id, by, limit=None, currency=money.DEFAULT_CURRENCY):
+    buckets = {}
+    rows = await expense_model.Expense.astream(
+        expense_group_statement(
+            user_id, by, limit, currency, get_async_session().bind.dialect.name
+        )
+    )
+    async for row in rows:
+        group_key = getattr(row.group_key, "value", row.group_key)
+        bucket = buckets.get(group_key)
+        if bucket is None:
+            bucket = buckets[group_key] = {
+                "count": row.group_count,
+                "total": money.to_float(row.group_total, currency),
+                "expenses": [],
+            }
+        bucket["expenses"].append(
+            {
+                "id": row.id,
+                "name": row.name,
+                "amount": money.to_float(row.amount_minor, row.currency),
+                "currency": row.currency,
+                "category": (
+                    {"id": row.category_id, "name": row.category_name}
+                    if by != "category" and row.category_id is not None
+                    else None
+                ),
+                "paid_by": row.paid_by.value if by != "paid_by" else None,
+                "is_spend": row.is_spend,
+                "payment_date": row.payment_date,
+                "other_details": row.other_details,
+            }
+        )
+    return buckets
+
+
+def _validate_group_by(by):
+    if by and by not in ["category", "paid_by"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid filter. Must be of category, paid_by.",
+        )
 
 
 @router.get(
@@ -269,58 +741,213 @@ def update_expense(
     status_code=status.HTTP_200_OK,
     response_model=Dict[str, List[schemas.ExpenseByGroup]],
 )
-def get_expenses_group(
+@cached_response
+async def get_expenses_group(
     request: Request,
     by: str,
+    limit: Union[int, None] = Query(None, ge=1),
 ):
-    if by and by not in ["category", "paid_by"]:
+    _validate_group_by(by)
+    try:
+        buckets = await _group_expenses(
+            request.state.user_id, by, limit, request.state.user["base_currency"]
+        )
+    except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid filter. Must be of category, paid_by.",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+    return serializers.json_response(
+        {key: bucket["expenses"] for key, bucket in buckets.items()}
+    )
+
+
+@router.get(
+    "/group/summary",
+    summary="Get expense counts, totals and latest expenses per group",
+    status_code=status.HTTP_200_OK,
+    response_model=Dict[str, schemas.ExpenseGroupBucket],
+)
+@cached_response
+async def get_expenses_group_summary(
+    request: Request,
+    by: str,
+    limit: Union[int, None] = Query(None, ge=1),
+):
+    _validate_group_by(by)
     try:
-        expenses = (
-            expense_model.Expense.query()
-            .filter(expense_model.Expense.created_by_id == request.state.user_id)
-            .all()
-        )
-        expenses = [jsonable_encoder(e) for e in expenses]
-
-        result = {}
-        for e in expenses:
-            temp = e.pop(by)
-            if by == "category":
-                temp = temp["name"]
-            if temp not in result:
-                result[temp] = []
-            result[temp].append(e)
-        return result
+        buckets = await _group_expenses(
+            request.state.user_id, by, limit, request.state.user["base_currency"]
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+    return serializers.json_response(buckets)
 
 
 @router.get(
-    "/{id}",
-    summary="Get a expenses",
+    "/search",
+    summary="Search expenses by name and details",
     status_code=status.HTTP_200_OK,
-    response_model=schemas.Expense,
+    response_model=List[schemas.ExpenseSearchResult],
 )
-def get_expense(
+@cached_response
+async def search(
     request: Request,
-    id,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
 ):
-    expense = expense_model.Expense.get_by(id=id, created_by_id=request.state.user_id)
-    if not expense:
+    headers = {}
+    try:
+        ranked = await search_expenses(request.state.user_id, q, limit + 1, offset)
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            headers["X-Next-Offset"] = str(offset + limit)
+        ranks = dict(ranked)
+        rows = []
+        if ranks:
+            rows = (
+                await expense_model.Expense.aexecute(
+                    expense_list_statement(
+                        request.state.user_id, expense_model.Expense.id.in_(ranks)
+                    )
+                )
+            ).all()
+        expenses = {row.id: serializers.expense_row_to_dict(row) for row in rows}
+        results = [
+            dict(expenses[id], rank=round(rank, 4))
+            for id, rank in ranked
+            if id in expenses
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(results, headers=headers)
+
+
+@router.post(
+    "/{id}/recurrence",
+    summary="Repeat an expense on a schedule",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.RecurrenceRule,
+)
+async def create_recurrence(
+    request: Request,
+    id: int,
+    payload: schemas.CreateRecurrence,
+):
+    template = await expense_model.Expense.aget_by(
+        raiseload("*"), id=id, created_by_id=request.state.user_id
+    )
+    if not template:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expense not found.",
         )
+    if await RecurrenceRule.aget_by(template_expense_id=id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Expense already repeats.",
+        )
+    starts_at = (
+        template.payment_date or template.created_at or datetime.now(timezone.utc)
+    )
+    ends_at = payload.ends_at and align(payload.ends_at, starts_at)
+    if ends_at is not None and ends_at <= starts_at:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ends_at must be after the expense's payment date.",
+        )
+    try:
+        rule = await RecurrenceRule.acreate(
+            template_expense_id=id,
+            frequency=payload.frequency,
+            interval=payload.interval,
+            starts_at=starts_at,
+            ends_at=ends_at,
+            occurrences=1,
+            next_run_at=occurrence(starts_at, payload.frequency, payload.interval, 1),
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(
+        rule_dict(rule), status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.get(
+    "/recurrences",
+    summary="Get all recurring expenses",
+    status_code=status.HTTP_200_OK,
+    response_model=List[schemas.RecurrenceRule],
+)
+@cached_response
+async def get_recurrences(request: Request):
+    try:
+        rules = (
+            await RecurrenceRule.aexecute(
+                select(RecurrenceRule)
+                .where(RecurrenceRule.created_by_id == request.state.user_id)
+                .order_by(RecurrenceRule.id)
+            )
+        ).scalars()
+        results = [rule_dict(rule) for rule in rules]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(results)
+
+
+@router.delete(
+    "/recurrences/{rule_id}",
+    summary="Stop repeating an expense",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_recurrence(
+    request: Request,
+    rule_id: int,
+):
+    rule = await RecurrenceRule.aget_by(id=rule_id, created_by_id=request.state.user_id)
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Recurrence not found.",
+        )
     try:
-        expense = jsonable_encoder(expense)
+        await rule.adelete()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-    return expense
+    return "Deleted successfully"
+
+
+@router.get(
+    "/{id}",
+    summary="Get a expenses",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.Expense,
+)
+@cached_response
+async def get_expense(
+    request: Request,
+    id: int,
+):
+    row = (
+        await expense_model.Expense.aexecute(
+            expense_list_statement(
+                request.state.user_id, expense_model.Expense.id == id
+            )
+        )
+    ).first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found.",
+        )
+    return serializers.json_response(serializers.expense_row_to_dict(row))
@@ -0,0 +1,505 @@
+from typing import List, Union
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.orm import raiseload, selectinload
+
+from db import get_async_session
+
+from .. import ledger, money, rates, schemas, serializers, settlement
+from ..models import expense_model, group_model
+from ..models.ledger_model import GroupMemberBalance, PairBalance
+
+router = APIRouter()
+
+
+def _group_dict(group, member_ids):
+    return {
+        "id": group.id,
+        "name": group.name,
+        "desc": group.desc,
+        "owner_id": group.owner_id,
+        "currency": group.currency,
+        "member_ids": member_ids,
+    }
+
+
+def _expense_dict(expense, currency, splits=None):
+    """`splits` are ``(user_id, amount_minor, share)`` tuples, read from the expense if omitted."""
+    if splits is None:
+        splits = [
+            (split.user_id, split.amount_minor, split.share) for split in expense.splits
+        ]
+    return {
+        "id": expense.id,
+        "group_id": expense.group_id,
+        "name": expense.name,
+        "amount": money.to_float(expense.amount_minor, currency),
+        "paid_by_id": expense.paid_by_id,
+        "split_type": expense.split_type.value,
+        "payment_date": expense.payment_date,
+        "created_at": expense.created_at,
+        "splits": [
+            {
+                "user_id": user_id,
+                "amount": money.to_float(amount_minor, currency),
+                "share": share,
+            }
+            for user_id, amount_minor, share in sorted(splits)
+        ],
+    }
+
+
+async def _member_ids(group_id: int) -> List[int]:
+    return await expense_model.ExpenseGroupUser.ascalars(
+        select(expense_model.ExpenseGroupUser.user_id)
+        .where(expense_model.ExpenseGroupUser.group_id == group_id)
+        .distinct()
+        .order_by(expense_model.ExpenseGroupUser.user_id)
+    )
+
+
+async def _get_group(group_id: int, user_id: int):
+    """Return the group and its member ids, or 404 unless `user_id` is a member."""
+    group = await expense_model.ExpenseGroup.aget(group_id, raiseload("*"))
+    member_ids = await _member_ids(group_id) if group else []
+    if user_id not in member_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Group not found.",
+        )
+    return group, member_ids
+
+
+async def _check_users_exist(user_ids):
+    found = await expense_model.User.ascalars(
+        select(expense_model.User.id).where(expense_model.User.id.in_(user_ids))
+    )
+    missing = sorted(set(user_ids) - set(found))
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown users: {missing}",
+        )
+
+
+def _resolve_splits(payload: schemas.CreateGroupExpense, member_ids, currency):
+    """Validate the payload against the members and return ``[(user_id, amount_minor, share)]``."""
+    if payload.splits:
+        user_ids = [split.user_id for split in payload.splits]
+        shares = [split.share for split in payload.splits]
+    elif payload.split_type == "equal":
+        user_ids, shares = member_ids, None
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A {payload.split_type} split needs a share for every member.",
+        )
+    outsiders = sorted(set(user_ids) - set(member_ids))
+    if outsiders:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Users {outsiders} are not members of this group",
+        )
+    try:
+        owed = settlement.split_amount(
+            payload.amount, payload.split_type, user_ids, shares, currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if payload.split_type == "equal":
+        return [(user_id, amount, None) for user_id, amount in owed]
+    return [(user_id, amount, share) for (user_id, amount), share in zip(owed, shares)]
+
+
+def _payer(payload: schemas.CreateGroupExpense, user_id: int, member_ids):
+    paid_by_id = payload.paid_by_id or user_id
+    if paid_by_id not in member_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The payer must be a member of the group",
+        )
+    return paid_by_id
+
+
+async def _get_group_expense(group_id: int, expense_id: int, user_id: int):
+    group, member_ids = await _get_group(group_id, user_id)
+    # Lock the expense so concurrent writers cannot remove the same old splits
+    # from the ledger twice; its splits only change while this lock is held.
+    expense = await group_model.GroupExpense.aget_for_update(
+        selectinload(group_model.GroupExpense.splits),
+        raiseload("*"),
+        id=expense_id,
+        group_id=group_id,
+    )
+    if not expense:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found.",
+        )
+    if user_id not in (expense.created_by_id, group.owner_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the expense creator or the group owner can change it",
+        )
+    return group, expense, member_ids
+
+
+async def _balances(group_id: int):
+    """Paid, owed and net minor units of every member."""
+    result = await GroupMemberBalance.aexecute(
+        ledger.member_balance_statement(group_id)
+    )
+    return [
+        {
+            "user_id": row.user_id,
+            "paid": int(row.paid),
+            "owed": int(row.owed),
+            "net": int(row.paid - row.owed),
+        }
+        for row in result
+    ]
+
+
+def _balance_dict(balance, convert):
+    return dict(
+        balance,
+        paid=convert(balance["paid"]),
+        owed=convert(balance["owed"]),
+        net=convert(balance["net"]),
+    )
+
+
+@router.post(
+    "/",
+    summary="Create a group with the current user as owner",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_group(
+    request: Request,
+    payload: schemas.CreateExpenseGroup,
+):
+    user_id = request.state.user_id
+    member_ids = sorted(set(payload.group_user_ids) | {user_id})
+    await _check_users_exist(member_ids)
+    try:
+        db = get_async_session()
+        group = expense_model.ExpenseGroup(
+            name=payload.name,
+            desc=payload.desc,
+            owner_id=user_id,
+            currency=payload.currency or request.state.user["base_currency"],
+        )
+        db.add(group)
+        await db.flush()
+        db.add_all(
+            expense_model.ExpenseGroupUser(group_id=group.id, user_id=member_id)
+            for member_id in member_ids
+        )
+        await db.commit()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(
+        _group_dict(group, member_ids), status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.get("/", summary="Get the groups of the current user")
+async def get_groups(
+    request: Request,
+):
+    result = await expense_model.ExpenseGroup.aexecute(
+        select(
+            expense_model.ExpenseGroup.id,
+            expense_model.ExpenseGroup.name,
+            expense_model.ExpenseGroup.desc,
+            expense_model.ExpenseGroup.owner_id,
+            expense_model.ExpenseGroup.currency,
+        )
+        .join(
+            expense_model.ExpenseGroupUser,
+            expense_model.ExpenseGroupUser.group_id == expense_model.ExpenseGroup.id,
+        )
+        .where(expense_model.ExpenseGroupUser.user_id == request.state.user_id)
+        .distinct()
+        .order_by(expense_model.ExpenseGroup.id)
+    )
+    return serializers.json_response([dict(row) for row in result.mappings()])
+
+
+@router.get("/{group_id}", summary="Get a group and its members")
+async def get_group(
+    request: Request,
+    group_id: int,
+):
+    group, member_ids = await _get_group(group_id, request.state.user_id)
+    return serializers.json_response(_group_dict(group, member_ids))
+
+
+@router.post(
+    "/{group_id}/members",
+    summary="Add members to a group",
+    status_code=status.HTTP_200_OK,
+)
+async def add_group_members(
+    request: Request,
+    group_id: int,
+    payload: schemas.AddGroupMembers,
+):
+    group, member_ids = await _get_group(group_id, request.state.user_id)
+    if group.owner_id != request.state.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the group owner can add members",
+        )
+    new_ids = sorted(set(payload.user_ids) - set(member_ids))
+    if new_ids:
+        await _check_users_exist(new_ids)
+        try:
+            await expense_model.ExpenseGroupUser.abulk_insert(
+                [{"group_id": group_id, "user_id": user_id} for user_id in new_ids]
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+    return serializers.json_response(
+        _group_dict(group, sorted(set(member_ids) | set(new_ids)))
+    )
+
+
+@router.get("/{group_id}/expenses", summary="Get the expenses of a group")
+async def get_group_expenses(
+    request: Request,
+    group_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Union[int, None] = None,
+):
+    group, _ = await _get_group(group_id, request.state.user_id)
+    statement = (
+        group_model.GroupExpense.select()
+        .options(selectinload(group_model.GroupExpense.splits), raiseload("*"))
+        .where(group_model.GroupExpense.group_id == group_id)
+        .order_by(group_model.GroupExpense.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        statement = statement.where(group_model.GroupExpense.id < before_id)
+    expenses = await group_model.GroupExpense.ascalars(statement)
+    return serializers.json_response(
+        [_expense_dict(e, group.currency) for e in expenses]
+    )
+
+
+@router.post(
+    "/{group_id}/expenses",
+    summary="Add an expense split between group members",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_group_expense(
+    request: Request,
+    group_id: int,
+    payload: schemas.CreateGroupExpense,
+):
+    group, member_ids = await _get_group(group_id, request.state.user_id)
+    paid_by_id = _payer(payload, request.state.user_id, member_ids)
+    splits = _resolve_splits(payload, member_ids, group.currency)
+    expense = group_model.GroupExpense(
+        group_id=group_id,
+        name=payload.name,
+        amount_minor=money.to_minor(payload.amount, group.currency),
+        paid_by_id=paid_by_id,
+        split_type=group_model.SplitTypeEnum(payload.split_type),
+        payment_date=payload.payment_date,
+        splits=[
+            group_model.ExpenseSplit(
+                group_id=group_id, user_id=user_id, amount_minor=amount, share=share
+            )
+            for user_id, amount, share in splits
+        ],
+    )
+    try:
+        db = get_async_session()
+        db.add(expense)
+        await db.flush()
+        await ledger.record(
+            expense.id,
+            added=[
+                ledger.expense_entry(
+                    group_id,
+                    paid_by_id,
+                    expense.amount_minor,
+                    [(user_id, amount) for user_id, amount, _ in splits],
+                )
+            ],
+        )
+        await db.commit()
+        await db.refresh(expense)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(
+        _expense_dict(expense, group.currency, splits),
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.put("/{group_id}/expenses/{expense_id}", summary="Update a group expense")
+async def update_group_expense(
+    request: Request,
+    group_id: int,
+    expense_id: int,
+    payload: schemas.CreateGroupExpense,
+):
+    group, expense, member_ids = await _get_group_expense(
+        group_id, expense_id, request.state.user_id
+    )
+    paid_by_id = _payer(payload, request.state.user_id, member_ids)
+    splits = _resolve_splits(payload, member_ids, group.currency)
+    try:
+        removed = [ledger.split_entry(expense)]
+        expense.name = payload.name
+        expense.amount_minor = money.to_minor(payload.amount, group.currency)
+        expense.paid_by_id = paid_by_id
+        expense.split_type = group_model.SplitTypeEnum(payload.split_type)
+        expense.payment_date = payload.payment_date
+        # Update rows in place: replacing the collection would insert the new
+        # rows before deleting the old ones and trip the (expense, user) key.
+        existing = {split.user_id: split for split in expense.splits}
+        for user_id, amount, share in splits:
+            split = existing.pop(user_id, None)
+            if split is None:
+                expense.splits.append(
+                    group_model.ExpenseSplit(
+                        group_id=group_id,
+                        user_id=user_id,
+                        amount_minor=amount,
+                        share=share,
+                    )
+                )
+            else:
+                split.amount_minor, split.share = amount, share
+        for split in existing.values():
+            expense.splits.remove(split)
+        await ledger.record(
+            expense.id, added=[ledger.split_entry(expense)], removed=removed
+        )
+        await expense.asave()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return serializers.json_response(_expense_dict(expense, group.currency))
+
+
+@router.delete(
+    "/{group_id}/expenses/{expense_id}",
+    summary="Delete a group expense",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_group_expense(
+    request: Request,
+    group_id: int,
+    expense_id: int,
+):
+    _, expense, _ = await _get_group_expense(
+        group_id, expense_id, request.state.user_id
+    )
+    try:
+        await ledger.record(expense.id, removed=[ledger.split_entry(expense)])
+        await expense.adelete()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return "Deleted successfully"
+
+
+@router.get(
+    "/{group_id}/balances",
+    summary="Get what each member paid, owes and nets in a group",
+    response_model=List[schemas.MemberBalance],
+)
+async def get_group_balances(
+    request: Request,
+    group_id: int,
+):
+    group, _ = await _get_group(group_id, request.state.user_id)
+    balances = await _balances(group_id)
+    return serializers.json_response(
+        [
+            _balance_dict(balance, lambda minor: money.to_float(minor, group.currency))
+            for balance in balances
+        ]
+    )
+
+
+@router.get(
+    "/{group_id}/balances/me",
+    summary="Get what each other member owes the current user",
+    response_model=List[schemas.PairBalance],
+)
+async def get_my_group_balances(
+    request: Request,
+    group_id: int,
+):
+    group, _ = await _get_group(group_id, request.state.user_id)
+    result = await PairBalance.aexecute(
+        ledger.user_pair_statement(group_id, request.state.user_id)
+    )
+    return serializers.json_response(
+        [
+            {
+                "user_id": row.user_id,
+                "balance": money.to_float(row.balance, group.currency),
+            }
+            for row in result
+            if row.balance
+        ]
+    )
+
+
+@router.get(
+    "/{group_id}/settlement",
+    summary="Get the fewest transfers that settle a group",
+    response_model=schemas.GroupSettlement,
+)
+async def get_group_settlement(
+    request: Request,
+    group_id: int,
+    currency: Union[schemas.Currency, None] = None,
+):
+    """Amounts are in the group's currency unless `currency` asks for another,
+    converted at the latest known rate."""
+    group, _ = await _get_group(group_id, request.state.user_id)
+    balances = await _balances(group_id)
+    transfers = settlement.settle(
+        {balance["user_id"]: balance["net"] for balance in balances}
+    )
+    currency = currency or group.currency
+    try:
+        rate = await rates.rate_cache.rate(group.currency, currency)
+    except rates.MissingRate as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def convert(minor):
+        minor = rates.convert_minor(minor, group.currency, currency, rate)
+        return money.to_float(minor, currency)
+
+    return serializers.json_response(
+        {
+            "currency": currency,
+            "balances": [_balance_dict(balance, convert) for balance in balances],
+            "transfers": [
+                {
+                    "from_user_id": debtor,
+                    "to_user_id": creditor,
+                    "amount": convert(amount),
+                }
+                for debtor, creditor, amount in transfers
+            ],
+        }
+    )
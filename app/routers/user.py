@@ -7,17 +7,17 @@ router = APIRouter()
 
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_me(
+async def get_me(
     request: Request,
 ):
-    user = expense_model.User.get(request.state.user_id)
+    user = await expense_model.User.aget(request.state.user_id)
     return user
 
 
 @router.get("/all")
-def get_all(
+async def get_all(
     request: Request,
 ):
-    users = expense_model.User.query().all()
+    users = await expense_model.User.ascalars(expense_model.User.select())
     user_list = [schemas.UserResponse(**user.as_dict()) for user in users]
     return user_list
@@ -1,13 +1,20 @@
 from datetime import datetime
+from decimal import Decimal
 from typing import List, Literal, Union
 
-from pydantic import BaseModel, EmailStr, constr
+from pydantic import BaseModel, EmailStr, confloat, conint, constr, validator
+
+from app.utils import as_utc
+
+
+Currency = constr(regex=r"^[A-Z]{3}$")
 
 
 class UserBaseSchema(BaseModel):
     first_name: str
     last_name: str
     email: str
+    base_currency: Currency = None
 
     class Config:
         orm_mode = True
@@ -46,7 +53,7 @@ class ExpenseCategory(CreateExpenseCategory):
 class ExpenseBase(BaseModel):
     name: str
     paid_by: Literal["Bank", "Card", "Cash"] = None
-    amount: float
+    amount: Decimal
     is_spend: Union[bool, None] = True
     payment_date: datetime = None
     other_details: str = None
@@ -54,13 +61,41 @@ class ExpenseBase(BaseModel):
 
 class CreateExpense(ExpenseBase):
     category_id: int
+    currency: Currency = None
+
+    @validator("payment_date")
+    def payment_date_in_utc(cls, value):
+        # Stored in UTC so every dialect agrees on the rollup month.
+        return value and as_utc(value)
 
 
 class Expense(ExpenseBase, MyBaseModel):
     id: int
+    currency: str
     category: ExpenseCategory
 
 
+class ExpenseSearchResult(Expense):
+    rank: float
+
+
+class CreateRecurrence(BaseModel):
+    frequency: Literal["daily", "weekly", "monthly", "yearly"]
+    interval: conint(ge=1, le=366) = 1
+    ends_at: datetime = None
+
+
+class RecurrenceRule(BaseModel):
+    id: int
+    template_expense_id: int
+    frequency: str
+    interval: int
+    starts_at: datetime
+    ends_at: datetime = None
+    next_run_at: datetime
+    active: bool
+
+
 class ExpenseByGroup(BaseModel):
     id: int
     name: str
@@ -69,11 +104,60 @@ class ExpenseByGroup(BaseModel):
     paid_by: Union[str, None]
     is_spend: bool
     payment_date: datetime = None
-    other_details: str
+    other_details: str = None
+
+
+class ExpenseGroupBucket(BaseModel):
+    count: int
+    total: float
+    expenses: List[ExpenseByGroup]
 
 
 class CreateExpenseGroup(BaseModel):
     name: str
     desc: str
-    owner_id: int
+    owner_id: int = None
+    currency: Currency = None
     group_user_ids: List[int]
+
+
+class AddGroupMembers(BaseModel):
+    user_ids: List[int]
+
+
+class SplitShare(BaseModel):
+    user_id: int
+    share: float = None
+
+
+class CreateGroupExpense(BaseModel):
+    name: str
+    amount: confloat(gt=0)
+    paid_by_id: int = None
+    split_type: Literal["equal", "exact", "percentage"] = "equal"
+    splits: List[SplitShare] = None
+    payment_date: datetime = None
+
+
+class MemberBalance(BaseModel):
+    user_id: int
+    paid: float
+    owed: float
+    net: float
+
+
+class PairBalance(BaseModel):
+    user_id: int
+    balance: float
+
+
+class Transfer(BaseModel):
+    from_user_id: int
+    to_user_id: int
+    amount: float
+
+
+class GroupSettlement(BaseModel):
+    currency: str
+    balances: List[MemberBalance]
+    transfers: List[Transfer]
@@ -0,0 +1,47 @@
+"""Ranked expense search over `name` and `other_details`.
+
+Postgres matches the `search_vector` tsvector column with a prefix tsquery
+and falls back to pg_trgm word similarity for typos, both index-backed.
+Search needs Postgres, like the migrations that create those indexes.
+"""
+import re
+
+from sqlalchemy import func, literal, literal_column, or_, select
+
+from app.models import expense_model
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def search_statement(user_id, q, tokens):
+    """Matching expense ids with a 0..1 rank, best first."""
+    vector = literal_column("expense.search_vector")
+    document = literal_column(expense_model.SEARCH_DOCUMENT)
+    # Tokens are \w+ only, so they are safe to splice into tsquery syntax.
+    query = func.to_tsquery(
+        literal_column("'simple'"), " & ".join(token + ":*" for token in tokens)
+    )
+    rank = func.greatest(
+        func.ts_rank_cd(vector, query), func.word_similarity(q, document)
+    ).label("rank")
+    return (
+        select(expense_model.Expense.id, rank)
+        .where(expense_model.Expense.created_by_id == user_id)
+        .where(or_(vector.op("@@")(query), literal(q).op("<%")(document)))
+        .order_by(rank.desc(), expense_model.Expense.id.desc())
+    )
+
+
+async def search_expenses(user_id, q, limit, offset=0):
+    """Return up to `limit` ``(expense_id, rank)`` pairs, best match first."""
+    tokens = tokenize(q)
+    if not tokens:
+        return []
+    result = await expense_model.Expense.aexecute(
+        search_statement(user_id, q, tokens).limit(limit).offset(offset)
+    )
+    return [(row.id, row.rank) for row in result]
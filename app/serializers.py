@@ -0,0 +1,66 @@
+"""Column-tuple serializers that turn query rows straight into JSON bytes.
+
+The list endpoints select only the columns below instead of ORM instances, so
+encoding a row never touches relationships or re-validates through pydantic.
+"""
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app import money
+from app.models import expense_model
+
+EXPENSE_FIELDS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "name",
+    "paid_by",
+    "amount",
+    "currency",
+    "is_spend",
+    "payment_date",
+    "other_details",
+)
+_CATEGORY_ID = len(EXPENSE_FIELDS)
+_CATEGORY_NAME = _CATEGORY_ID + 1
+
+
+_AMOUNT = EXPENSE_FIELDS.index("amount")
+
+
+def expense_columns():
+    """Columns for EXPENSE_FIELDS; `amount` is selected as `amount_minor`."""
+    columns = [getattr(expense_model.Expense, field) for field in EXPENSE_FIELDS]
+    columns[_AMOUNT] = expense_model.Expense.amount_minor
+    return columns + [
+        expense_model.ExpenseCategory.id.label("category_ref_id"),
+        expense_model.ExpenseCategory.name.label("category_name"),
+    ]
+
+
+def expense_row_to_dict(row):
+    item = dict(zip(EXPENSE_FIELDS, row))
+    item["amount"] = money.to_float(item["amount"], item["currency"])
+    category_id = row[_CATEGORY_ID]
+    item["category"] = (
+        None
+        if category_id is None
+        else {"name": row[_CATEGORY_NAME], "id": category_id}
+    )
+    return item
+
+
+def expense_to_dict(expense):
+    """An Expense instance as the create and update endpoints return it."""
+    item = jsonable_encoder(expense, exclude={"amount_minor"})
+    item["amount"] = money.to_float(expense.amount_minor, expense.currency)
+    return item
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_response(content, **kwargs) -> Response:
+    return Response(dumps(content), media_type="application/json", **kwargs)
@@ -0,0 +1,88 @@
+"""Split computation and debt simplification for group expenses.
+
+Money is handled in integer minor units of the group's currency, as it is
+stored, so shares always add up to the expense amount exactly and nets
+settle to zero. Only the submitted amount and shares are converted here.
+"""
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app import money
+
+
+def _largest_remainder(total: int, weights: Sequence[float]) -> List[int]:
+    """Apportion `total` minor units by `weights`, handing leftover units to the largest fractions."""
+    weight_sum = sum(weights)
+    raw = [total * weight / weight_sum for weight in weights]
+    cents = [int(value) for value in raw]
+    leftover = total - sum(cents)
+    by_fraction = sorted(range(len(raw)), key=lambda i: raw[i] - cents[i], reverse=True)
+    for i in by_fraction[:leftover]:
+        cents[i] += 1
+    return cents
+
+
+def split_amount(
+    amount: float,
+    split_type: str,
+    user_ids: Sequence[int],
+    shares: Optional[Sequence[float]] = None,
+    currency: Optional[str] = None,
+) -> List[Tuple[int, int]]:
+    """Return ``(user_id, minor units owed)`` for each user; raises ValueError on bad shares."""
+    if not user_ids:
+        raise ValueError("an expense must be split between at least one member")
+    if len(set(user_ids)) != len(user_ids):
+        raise ValueError("a member can only appear once in a split")
+    total = money.to_minor(amount, currency)
+
+    if split_type == "equal":
+        cents = _largest_remainder(total, [1] * len(user_ids))
+    elif split_type == "exact":
+        if shares is None or any(share is None for share in shares):
+            raise ValueError("exact splits need an amount for every member")
+        cents = [money.to_minor(share, currency) for share in shares]
+        if sum(cents) != total:
+            raise ValueError("exact shares must add up to the expense amount")
+    elif split_type == "percentage":
+        if shares is None or any(share is None for share in shares):
+            raise ValueError("percentage splits need a percentage for every member")
+        if any(share < 0 for share in shares) or abs(sum(shares) - 100) > 1e-6:
+            raise ValueError("percentages must be non-negative and add up to 100")
+        cents = _largest_remainder(total, shares)
+    else:
+        raise ValueError("unknown split type %r" % split_type)
+
+    if any(value < 0 for value in cents):
+        raise ValueError("shares cannot be negative")
+    return list(zip(user_ids, cents))
+
+
+def settle(balances: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    """Simplify net minor unit balances into ``(from_user_id, to_user_id, amount)`` transfers.
+
+    Greedy minimum cash flow: the largest debtor pays the largest creditor,
+    which clears at least one of them, so there are at most n - 1 transfers
+    and the heap work is O(n log n).
+    """
+    creditors = []
+    debtors = []
+    for user_id, cents in balances.items():
+        if cents > 0:
+            creditors.append((-cents, user_id))
+        elif cents < 0:
+            debtors.append((cents, user_id))
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debit, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debit)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debit > amount:
+            heapq.heappush(debtors, (debit + amount, debtor))
+    return transfers
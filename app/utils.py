@@ -1,13 +1,59 @@
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from dotenv import load_dotenv
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from app.config import settings
+from app.metrics import Histogram, registry
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def as_utc(value: datetime) -> datetime:
+    """`value` as an aware UTC datetime; naive values are taken to be UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def build_password_context(
+    schemes,
+    bcrypt_rounds: int = 12,
+    argon2_time_cost: int = 3,
+    argon2_memory_cost: int = 65536,
+    argon2_parallelism: int = 2,
+) -> CryptContext:
+    """New hashes use the first scheme; older schemes or bcrypt hashes of any
+    other cost are reported by `needs_update` and rehashed on the next
+    successful login, so lowering the cost also lowers it for existing users.
+    argon2 needs the optional `argon2-cffi` package."""
+    options = {
+        "bcrypt__default_rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+    }
+    if "argon2" in schemes:
+        options.update(
+            argon2__time_cost=argon2_time_cost,
+            argon2__memory_cost=argon2_memory_cost,
+            argon2__parallelism=argon2_parallelism,
+        )
+    return CryptContext(schemes=list(schemes), deprecated="auto", **options)
+
+
+password_context = build_password_context(
+    [scheme.strip() for scheme in settings.PASSWORD_SCHEMES.split(",")],
+    bcrypt_rounds=settings.BCRYPT_ROUNDS,
+    argon2_time_cost=settings.ARGON2_TIME_COST,
+    argon2_memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2_parallelism=settings.ARGON2_PARALLELISM,
+)
 
 
 def get_hashed_password(password: str) -> str:
@@ -16,3 +62,71 @@ def get_hashed_password(password: str) -> str:
 
 def verify_password(password: str, hashed_pass: str) -> bool:
     return password_context.verify(password, hashed_pass)
+
+
+def verify_and_update_password(password: str, hashed_pass: str):
+    """Return ``(valid, new_hash)``; `new_hash` is None unless a rehash is due."""
+    return password_context.verify_and_update(password, hashed_pass)
+
+
+class PasswordHashPool(object):
+    """Runs password hashing on a dedicated bounded pool with back-pressure.
+
+    bcrypt releases the GIL, so a small thread pool keeps hashing off the
+    request threadpool; once `max_pending` calls are queued or running, new
+    ones are rejected with 429 instead of piling up behind the login burst.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.latency = Histogram(buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many sign-ins in progress, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, fn, *args
+            )
+        finally:
+            self.pending -= 1
+            self.latency.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {"pending": self.pending, "rejected": self.rejected}
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+registry.register_histogram(
+    "password_hash_duration_seconds",
+    password_pool.latency,
+    "Password hash and verify latency, including queueing.",
+)
+registry.register_stats("password_hash", password_pool.stats, counters=("rejected",))
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(get_hashed_password, password)
+
+
+async def verify_password_async(password: str, hashed_pass: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed_pass)
+
+
+async def verify_and_update_password_async(password: str, hashed_pass: str):
+    return await password_pool.run(verify_and_update_password, password, hashed_pass)
@@ -1,13 +1,53 @@
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.config import settings
+from app.metrics import install_lazy_load_detector, install_query_hooks
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=QueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+install_query_hooks(engine)
+install_query_hooks(async_engine.sync_engine)
+
+AsyncSessionLocal = sessionmaker(
+    autoflush=False, bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+install_lazy_load_detector(
+    Session, settings.N_PLUS_ONE_MODE, settings.N_PLUS_ONE_THRESHOLD
+)
+
+_session: ContextVar[Optional[Session]] = ContextVar("db_session", default=None)
+_async_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "async_db_session", default=None
+)
+
 
 def get_db():
     db_session = SessionLocal()
@@ -15,3 +55,55 @@ def get_db():
         yield db_session
     finally:
         db_session.close()
+
+
+async def get_async_db():
+    db_session = AsyncSessionLocal()
+    try:
+        yield db_session
+    finally:
+        await db_session.close()
+
+
+@contextmanager
+def session_scope():
+    """Bind a session from `get_db` to the current context until the block exits."""
+    sessions = get_db()
+    db_session = next(sessions)
+    token = _session.set(db_session)
+    try:
+        yield db_session
+    finally:
+        _session.reset(token)
+        sessions.close()
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """Async counterpart of `session_scope`, built on `get_async_db`."""
+    sessions = get_async_db()
+    db_session = await sessions.__anext__()
+    token = _async_session.set(db_session)
+    try:
+        yield db_session
+    finally:
+        _async_session.reset(token)
+        await sessions.aclose()
+
+
+def get_session() -> Session:
+    db_session = _session.get()
+    if db_session is None:
+        raise RuntimeError(
+            "No database session in scope, wrap the call in db.session_scope()"
+        )
+    return db_session
+
+
+def get_async_session() -> AsyncSession:
+    db_session = _async_session.get()
+    if db_session is None:
+        raise RuntimeError(
+            "No async database session in scope, wrap the call in db.async_session_scope()"
+        )
+    return db_session
@@ -1,13 +1,20 @@
+import asyncio
+import contextlib
+
 import uvicorn
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 
 from app.models import expense_model
 from app.oauth2 import require_user
-from app.routers import authentication, expense, user, charts
+from app.routers import authentication, expense, user, charts, group
 from db import engine
-from app.middlewares import CustomContextMiddleware
+from app.middlewares import CustomContextMiddleware, DBSessionMiddleware
+from app.metrics import MetricsMiddleware, registry
+from app.config import settings
+from app.recurrence import run_scheduler
+from app.ledger import run_snapshots
 
 expense_model.Base.metadata.create_all(bind=engine)
 
@@ -27,6 +34,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(CustomContextMiddleware)
+app.add_middleware(DBSessionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(authentication.router, tags=["Auth"], prefix="/api/auth")
 app.include_router(
@@ -47,12 +56,43 @@ app.include_router(
     prefix="/api/charts",
     dependencies=[Depends(require_user)],
 )
+app.include_router(
+    group.router,
+    tags=["Group"],
+    prefix="/api/group",
+    dependencies=[Depends(require_user)],
+)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.background_tasks = []
+    if settings.RECURRENCE_SCHEDULER_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(run_scheduler()))
+    if settings.LEDGER_SNAPSHOT_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(run_snapshots()))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
 
 @app.get("/api/healthchecker")
 def root():
     return {"message": "Hello World"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/", response_class=RedirectResponse, include_in_schema=False)
 def docs():
     return RedirectResponse(url="/docs")
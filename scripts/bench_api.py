@@ -0,0 +1,222 @@
+"""Drive the API at fixed concurrency and report latency, throughput and queries.
+
+Run ``scripts.seed_benchmark`` first, start the server, then:
+
+    python -m scripts.bench_api --base-url http://localhost:8080 \\
+        --concurrency 16 --requests 2000 --output bench/results.json
+
+Each scenario issues ``--requests`` requests spread over ``--concurrency``
+threads, rotating through the seeded users. Queries per request come from
+the ``Server-Timing`` header. ``--bust-cache`` adds a unique query parameter
+so GETs miss the response cache. Results are written as JSON together with
+the git commit so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from itertools import count
+
+DEFAULT_PASSWORD = "bench-password"
+
+SCENARIOS = {
+    "login": ("POST", "/api/auth/login"),
+    "expense_list": ("GET", "/api/expense/?limit=50"),
+    "expense_group": ("GET", "/api/expense/group?by=category&limit=5"),
+    "category_expense": ("GET", "/api/charts/category_expense"),
+}
+
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def bench_email(prefix, n):
+    return "%s-%d@example.com" % (prefix, n)
+
+
+def _request(base_url, method, path, token=None, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("Authorization", "Bearer %s" % token)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            payload = response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as exc:
+        payload, status, headers = exc.read(), exc.code, exc.headers
+    elapsed = time.perf_counter() - started
+    match = _QUERIES.search(headers.get("Server-Timing", ""))
+    return status, elapsed, int(match.group(1)) if match else None, payload
+
+
+def login(base_url, email, password):
+    status, _, _, payload = _request(
+        base_url,
+        "POST",
+        "/api/auth/login",
+        body={"email": email, "password": password},
+    )
+    if status != 200:
+        raise SystemExit("login failed for %s: %d %s" % (email, status, payload[:200]))
+    return json.loads(payload)["access_token"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(
+        len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1)))
+    )
+    return sorted_values[index]
+
+
+def run_scenario(args, name, credentials, tokens):
+    method, path = SCENARIOS[name]
+    samples = []
+    lock = threading.Lock()
+    sequence = count()
+
+    def worker():
+        while True:
+            n = next(sequence)
+            if n >= args.requests:
+                return
+            user = n % len(tokens)
+            if name == "login":
+                email, password = credentials[user]
+                result = _request(
+                    args.base_url,
+                    method,
+                    path,
+                    body={"email": email, "password": password},
+                )
+            else:
+                target = path
+                if args.bust_cache:
+                    target += ("&" if "?" in target else "?") + "_bench=%d" % n
+                result = _request(args.base_url, method, target, token=tokens[user])
+            with lock:
+                samples.append(result[:3])
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for _, elapsed, _ in samples)
+    queries = [q for _, _, q in samples if q is not None]
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "method": method,
+        "path": path,
+        "requests": len(samples),
+        "errors": sum(1 for status, _, _ in samples if status >= 400),
+        "statuses": statuses,
+        "throughput_rps": len(samples) / wall if wall else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+        },
+        "queries_per_request": sum(queries) / len(queries) if queries else None,
+    }
+
+
+def git_revision():
+    def git(*argv):
+        return subprocess.run(
+            ("git",) + argv, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--users", type=int, default=10, help="seeded users to use")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="repeatable; defaults to all scenarios",
+    )
+    parser.add_argument("--bust-cache", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
+
+    credentials = [
+        (bench_email(args.prefix, n), args.password) for n in range(args.users)
+    ]
+    tokens = [login(args.base_url, email, password) for email, password in credentials]
+
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "settings": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "bust_cache": args.bust_cache,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        stats = run_scenario(args, name, credentials, tokens)
+        results["scenarios"][name] = stats
+        latency = stats["latency_ms"]
+        print(
+            "%-18s %6d req %4d err %8.1f req/s  p50 %7.1f  p95 %7.1f  p99 %7.1f ms"
+            "  %s queries/req"
+            % (
+                name,
+                stats["requests"],
+                stats["errors"],
+                stats["throughput_rps"] or 0,
+                latency["p50"] or 0,
+                latency["p95"] or 0,
+                latency["p99"] or 0,
+                "-"
+                if stats["queries_per_request"] is None
+                else "%.1f" % stats["queries_per_request"],
+            )
+        )
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("results written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
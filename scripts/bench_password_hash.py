@@ -0,0 +1,71 @@
+"""Report password hashes per second for each candidate work-factor setting.
+
+Use it to pick BCRYPT_ROUNDS (or the ARGON2_* settings) for the hardware the
+API runs on; a login costs one verify, which takes as long as one hash.
+argon2 settings are skipped unless ``argon2-cffi`` is installed.
+
+    python -m scripts.bench_password_hash --bcrypt-rounds 10 11 12 13
+    python -m scripts.bench_password_hash --argon2 3:65536:2 2:19456:1
+"""
+import argparse
+import time
+
+from passlib.exc import MissingBackendError
+
+from app.utils import build_password_context
+
+PASSWORD = "correct horse battery staple"
+
+
+def _settings(args):
+    for rounds in args.bcrypt_rounds:
+        yield "bcrypt rounds=%d" % rounds, build_password_context(
+            ["bcrypt"], bcrypt_rounds=rounds
+        )
+    for spec in args.argon2:
+        time_cost, memory_cost, parallelism = (int(part) for part in spec.split(":"))
+        label = "argon2 t=%d m=%dKiB p=%d" % (time_cost, memory_cost, parallelism)
+        yield label, build_password_context(
+            ["argon2"],
+            argon2_time_cost=time_cost,
+            argon2_memory_cost=memory_cost,
+            argon2_parallelism=parallelism,
+        )
+
+
+def measure(context, duration):
+    hashed = context.hash(PASSWORD)
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        context.verify(PASSWORD, hashed)
+        count += 1
+    elapsed = time.perf_counter() - started
+    return count / elapsed, elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, nargs="*", default=[10, 11, 12, 13]
+    )
+    parser.add_argument(
+        "--argon2",
+        nargs="*",
+        default=[],
+        metavar="TIME:MEMORY_KIB:PARALLELISM",
+    )
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    for label, context in _settings(args):
+        try:
+            rate, per_hash = measure(context, args.duration)
+        except MissingBackendError as exc:
+            print("%-32s skipped (%s)" % (label, exc))
+            continue
+        print("%-32s %8.2f hashes/s %8.1f ms/hash" % (label, rate, per_hash * 1e3))
+
+
+if __name__ == "__main__":
+    main()
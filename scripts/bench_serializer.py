@@ -0,0 +1,91 @@
+"""Compare the per-row cost of the old and the column-tuple expense encoders.
+
+The old path is what GET /api/expense/ used to do: ``jsonable_encoder`` on each
+ORM instance, validation through ``response_model=List[schemas.Expense]`` and
+a second ``jsonable_encoder`` + ``json.dumps`` in FastAPI. No database is used.
+
+    python -m scripts.bench_serializer --rows 5000 --repeat 5
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app import schemas, serializers
+from app.models import expense_model
+
+
+def _instances(rows):
+    category = expense_model.ExpenseCategory(
+        id=1, name="Food", created_at=datetime(2022, 1, 1)
+    )
+    start = datetime(2022, 1, 1)
+    return [
+        expense_model.Expense(
+            id=i,
+            name=f"expense {i}",
+            paid_by=expense_model.PaidByEnum.Card,
+            amount_minor=-1250,
+            currency="USD",
+            is_spend=True,
+            category_id=category.id,
+            category=category,
+            payment_date=start + timedelta(hours=i),
+            other_details="lunch",
+            created_at=start,
+            updated_at=None,
+        )
+        for i in range(rows)
+    ]
+
+
+def _tuples(instances):
+    return [
+        tuple(
+            e.amount_minor if field == "amount" else getattr(e, field)
+            for field in serializers.EXPENSE_FIELDS
+        )
+        + (e.category.id, e.category.name)
+        for e in instances
+    ]
+
+
+def encode_orm(instances):
+    content = [serializers.expense_to_dict(e) for e in instances]
+    validated = [schemas.Expense.parse_obj(item) for item in content]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def encode_tuples(rows):
+    return serializers.dumps([serializers.expense_row_to_dict(row) for row in rows])
+
+
+def _best_of(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    instances = _instances(args.rows)
+    rows = _tuples(instances)
+    old = _best_of(encode_orm, instances, args.repeat)
+    new = _best_of(encode_tuples, rows, args.repeat)
+    print("rows: %d" % args.rows)
+    print("jsonable_encoder + response_model: %8.2f us/row" % (old / args.rows * 1e6))
+    print("column tuples + orjson:            %8.2f us/row" % (new / args.rows * 1e6))
+    print("speedup: %.1fx" % (old / new))
+
+
+if __name__ == "__main__":
+    main()
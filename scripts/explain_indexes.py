@@ -0,0 +1,91 @@
+"""Check that the router queries are served by the per-user indexes.
+
+Runs ``EXPLAIN (FORMAT JSON)`` against Postgres for each query with sequential
+scans disabled and exits non-zero when a plan does not use an expected index.
+
+    python -m scripts.explain_indexes
+"""
+import json
+import sys
+
+from app.models import expense_model
+from app.routers.charts import category_expense_statement
+from app.routers.expense import category_list_statement, expense_list_statement
+from db import engine
+
+USER_ID = 1
+CATEGORY_ID = 1
+
+CHECKS = [
+    (
+        "GET /api/expense/",
+        expense_list_statement(USER_ID).limit(50),
+        {"ix_expense_created_by_id_payment_date_id"},
+    ),
+    (
+        "GET /api/expense/?type=category",
+        expense_list_statement(
+            USER_ID, expense_model.Expense.category_id == CATEGORY_ID
+        ).limit(50),
+        {
+            "ix_expense_created_by_id_category_id",
+            "ix_expense_created_by_id_payment_date_id",
+        },
+    ),
+    (
+        "GET /api/expense/categories",
+        category_list_statement(USER_ID),
+        {"ix_expensecategory_created_by_id_created_at"},
+    ),
+    (
+        "GET /api/charts/category_expense",
+        category_expense_statement(USER_ID),
+        {
+            "ix_expense_created_by_id_category_id",
+            "ix_expense_created_by_id_payment_date_id",
+        },
+    ),
+    (
+        "DELETE /api/expense/category/{id}",
+        expense_model.Expense.select().filter_by(category_id=CATEGORY_ID).limit(1),
+        {"ix_expense_category_id", "ix_expense_created_by_id_category_id"},
+    ),
+]
+
+
+def _index_names(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def main():
+    failures = 0
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        for label, statement, expected in CHECKS:
+            used = _index_names(explain(connection, statement))
+            ok = bool(used & expected)
+            failures += not ok
+            print(
+                "%-4s %s: %s"
+                % ("ok" if ok else "FAIL", label, ", ".join(sorted(used)) or "-")
+            )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
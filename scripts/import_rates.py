@@ -0,0 +1,103 @@
+"""Load exchange rates from a CSV file into the exchange rate table.
+
+    python -m scripts.import_rates rates.csv [--no-inverse] [--no-rebuild]
+
+The file needs ``date,base,quote,rate`` columns: one ``base`` is worth
+``rate`` ``quote`` from ``date`` (YYYY-MM-DD) on. Existing rates for the same
+pair and date are replaced, and the inverse rate is stored too unless
+``--no-inverse`` is given. Afterwards the rollups of every user with expenses
+outside their base currency are rebuilt at the new rates. Running servers
+pick the rates up once their rate cache expires (RATE_CACHE_TTL).
+"""
+import argparse
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import rollups
+from app.cache import warn_if_process_local
+from app.config import settings
+from app.models import expense_model
+from app.models.rate_model import ExchangeRate
+from db import session_scope
+
+
+def read_rates(path, inverse=True):
+    rates = {}
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                on = date.fromisoformat(row["date"].strip())
+                base = row["base"].strip().upper()
+                quote = row["quote"].strip().upper()
+                rate = Decimal(row["rate"].strip())
+            except (KeyError, AttributeError, ValueError, InvalidOperation) as e:
+                raise SystemExit("%s:%d: bad row %r (%s)" % (path, line, row, e))
+            if len(base) != 3 or len(quote) != 3 or base == quote or rate <= 0:
+                raise SystemExit("%s:%d: bad row %r" % (path, line, row))
+            rates[(base, quote, on)] = rate
+            if inverse:
+                rates.setdefault((quote, base, on), 1 / rate)
+    return [
+        {"base": base, "quote": quote, "rate_date": on, "rate": rate}
+        for (base, quote, on), rate in rates.items()
+    ]
+
+
+def upsert_rates(db, rows):
+    insert_ = (
+        postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    )
+    table = ExchangeRate.__table__
+    for start in range(0, len(rows), settings.BULK_INSERT_BATCH_SIZE):
+        statement = insert_(table).values(
+            rows[start : start + settings.BULK_INSERT_BATCH_SIZE]
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["base", "quote", "rate_date"],
+                set_={"rate": statement.excluded.rate},
+            )
+        )
+    db.commit()
+
+
+def converted_users(db):
+    expense = expense_model.Expense
+    user = expense_model.User
+    return (
+        db.execute(
+            select(expense.created_by_id)
+            .join(user, user.id == expense.created_by_id)
+            .where(expense.currency != user.base_currency)
+            .distinct()
+        )
+        .scalars()
+        .all()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--no-inverse", action="store_true")
+    parser.add_argument("--no-rebuild", action="store_true")
+    args = parser.parse_args()
+    warn_if_process_local()
+
+    rows = read_rates(args.path, inverse=not args.no_inverse)
+    with session_scope() as db:
+        upsert_rates(db, rows)
+        print("imported %d rates" % len(rows))
+        if not args.no_rebuild:
+            user_ids = converted_users(db)
+            for user_id in user_ids:
+                rollups.rebuild(db, user_id)
+            print("rebuilt rollups for %d users" % len(user_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Rebuild the expense rollup and user balance tables from the expense table.
+
+    python -m scripts.rebuild_rollups [--user-id ID]
+"""
+import argparse
+
+from app import rollups
+from app.cache import warn_if_process_local
+from db import session_scope
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, help="only rebuild this user")
+    args = parser.parse_args()
+    warn_if_process_local()
+
+    with session_scope() as db:
+        rollups.rebuild(db, args.user_id)
+    print("rebuilt rollups for %s" % (args.user_id or "all users"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Materialize due recurring expenses outside the API process.
+
+    python -m scripts.recurring_worker [--once] [--interval 60] [--batch-size 100]
+
+Safe to run next to the API's own scheduler and on several hosts at once:
+rules are claimed with FOR UPDATE SKIP LOCKED. Set
+RECURRENCE_SCHEDULER_ENABLED=false on the API to leave the work to workers.
+"""
+import argparse
+import asyncio
+
+from app import recurrence
+from app.cache import warn_if_process_local
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="drain due rules and exit")
+    parser.add_argument("--interval", type=int, default=settings.RECURRENCE_INTERVAL)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.RECURRENCE_BATCH_SIZE
+    )
+    args = parser.parse_args()
+    warn_if_process_local()
+
+    if args.once:
+        print("created %d expenses" % asyncio.run(recurrence.drain(args.batch_size)))
+    else:
+        asyncio.run(recurrence.run_scheduler(args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Seed the configured database with a reproducible benchmark dataset.
+
+Every seeded user is ``<prefix>-<n>@example.com`` with the same password, so
+``scripts.bench_api`` can log them in. Apart from payment dates, which span
+the ``--days`` before today, the dataset only depends on the arguments and
+``--seed``; ``--reset`` removes a previous run first.
+
+    python -m scripts.seed_benchmark --users 20 --categories 12 --expenses 5000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+
+from app import rollups, utils
+from app.models import expense_model, rollup_model
+from db import session_scope
+from scripts.bench_api import DEFAULT_PASSWORD, bench_email
+
+
+def reset(db, prefix):
+    user_ids = (
+        db.execute(
+            select(expense_model.User.id).where(
+                expense_model.User.email.like("%s-%%@example.com" % prefix)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    if not user_ids:
+        return 0
+    for model in (
+        rollup_model.ExpenseRollup,
+        rollup_model.UserBalance,
+    ):
+        db.execute(delete(model).where(model.user_id.in_(user_ids)))
+    for model in (expense_model.Expense, expense_model.ExpenseCategory):
+        db.execute(delete(model).where(model.created_by_id.in_(user_ids)))
+    db.execute(delete(expense_model.User).where(expense_model.User.id.in_(user_ids)))
+    db.commit()
+    return len(user_ids)
+
+
+def _expense_rows(rng, user_id, category_ids, count, start, days):
+    paid_by = list(expense_model.PaidByEnum)
+    for n in range(count):
+        is_spend = rng.random() < 0.85
+        amount = rng.randint(100, 25000 if is_spend else 250000)
+        yield {
+            "name": "expense %d" % n,
+            "paid_by": rng.choice(paid_by),
+            "amount_minor": -amount if is_spend else amount,
+            "is_spend": is_spend,
+            "category_id": rng.choice(category_ids),
+            "payment_date": start + timedelta(seconds=rng.randrange(days * 86400)),
+            "other_details": None,
+            "created_by_id": user_id,
+        }
+
+
+def seed(db, args):
+    rng = random.Random(args.seed)
+    hashed_password = utils.get_hashed_password(args.password)
+    today = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    start = today - timedelta(days=args.days)
+
+    users = [
+        expense_model.User(
+            first_name="Bench",
+            last_name=str(n),
+            email=bench_email(args.prefix, n),
+            hashed_password=hashed_password,
+        )
+        for n in range(args.users)
+    ]
+    db.add_all(users)
+    db.flush()
+    user_ids = [user.id for user in users]
+
+    for user_id in user_ids:
+        db.execute(
+            insert(expense_model.ExpenseCategory.__table__),
+            [
+                {"name": "category %d" % n, "created_by_id": user_id}
+                for n in range(args.categories)
+            ],
+        )
+        category_ids = (
+            db.execute(
+                select(expense_model.ExpenseCategory.id).where(
+                    expense_model.ExpenseCategory.created_by_id == user_id
+                )
+            )
+            .scalars()
+            .all()
+        )
+        rows = list(
+            _expense_rows(rng, user_id, category_ids, args.expenses, start, args.days)
+        )
+        for offset in range(0, len(rows), args.batch_size):
+            db.execute(
+                insert(expense_model.Expense.__table__),
+                rows[offset : offset + args.batch_size],
+            )
+    db.commit()
+    rollups.rebuild(db)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=10, help="per user")
+    parser.add_argument("--expenses", type=int, default=2000, help="per user")
+    parser.add_argument("--days", type=int, default=730, help="payment date spread")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="drop a previous run")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with session_scope() as db:
+        if args.reset:
+            print("removed %d previous benchmark users" % reset(db, args.prefix))
+        user_ids = seed(db, args)
+    print(
+        "seeded %d users, %d categories and %d expenses in %.1fs"
+        % (
+            len(user_ids),
+            len(user_ids) * args.categories,
+            len(user_ids) * args.expenses,
+            time.perf_counter() - started,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Check the group balance ledger and running balances against the splits.
+
+    python -m scripts.verify_ledger [--snapshot] [--repair]
+
+``--snapshot`` first stores pair balances as of the newest ledger entry so
+later checks only replay the entries after it; the app also takes one every
+LEDGER_SNAPSHOT_INTERVAL seconds. ``--repair`` appends
+correcting ledger entries and rewrites the running tables from the splits.
+Exits non-zero when problems were found and not repaired.
+"""
+import argparse
+import sys
+
+from app import ledger
+from db import session_scope
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot", action="store_true")
+    parser.add_argument("--keep", type=int, default=3, help="snapshots to keep")
+    parser.add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+
+    with session_scope() as db:
+        if args.snapshot:
+            upto = ledger.snapshot(db, keep=args.keep)
+            print("snapshot up to entry %s" % upto if upto else "ledger unchanged")
+        problems = ledger.verify(db)
+        for problem in problems:
+            print(problem)
+        if problems and args.repair:
+            print("appended %d correcting entries" % ledger.repair(db))
+            problems = ledger.verify(db)
+    print("%d problems" % len(problems))
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Placeholder values for the required settings, so modules import without a .env.
+
+The JWT keys are not real; tests that sign tokens patch in their own.
+Nothing here connects to a database.
+"""
+import os
+
+for name, value in {
+    "DATABASE_PORT": "5432",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_DB": "expenses_test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_HOSTNAME": "localhost",
+    "JWT_PUBLIC_KEY": "cGxhY2Vob2xkZXI=",
+    "JWT_PRIVATE_KEY": "cGxhY2Vob2xkZXI=",
+    "REFRESH_TOKEN_EXPIRES_IN": "60",
+    "ACCESS_TOKEN_EXPIRES_IN": "15",
+    "JWT_ALGORITHM": "RS256",
+    "CLIENT_ORIGIN": "http://localhost:3000",
+    "DEBUG": "false",
+}.items():
+    os.environ.setdefault(name, value)
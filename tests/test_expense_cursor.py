@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers.expense import _decode_cursor, _encode_cursor
+
+
+@pytest.mark.parametrize(
+    "payment_date",
+    [
+        datetime(2024, 2, 29, 13, 45, 12, 345678, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 9, 30),
+        None,
+    ],
+)
+def test_cursor_round_trips(payment_date):
+    cursor = _encode_cursor(SimpleNamespace(payment_date=payment_date, id=42))
+    assert _decode_cursor(cursor) == (payment_date, 42)
+
+
+def test_cursor_is_url_safe():
+    cursor = _encode_cursor(
+        SimpleNamespace(payment_date=datetime(2024, 1, 1), id=2**40)
+    )
+    assert set(cursor) <= set(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_="
+    )
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-base64!",
+        base64.urlsafe_b64encode(b"{}").decode(),
+        base64.urlsafe_b64encode(b'["2024-01-01"]').decode(),
+        base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+        base64.urlsafe_b64encode(b'[null, "x"]').decode(),
+    ],
+)
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,93 @@
+import logging
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, create_engine, select
+from sqlalchemy.orm import Session, declarative_base, relationship, selectinload
+
+from app import metrics
+
+Base = declarative_base()
+
+
+class Parent(Base):
+    __tablename__ = "parent"
+
+    id = Column(Integer, primary_key=True)
+    children = relationship("Child")
+
+
+class Child(Base):
+    __tablename__ = "child"
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, ForeignKey(Parent.id))
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all(Parent(id=id, children=[Child(), Child()]) for id in range(5))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def stats():
+    stats = metrics.RequestStats()
+    token = metrics._request_stats.set(stats)
+    yield stats
+    metrics._request_stats.reset(token)
+
+
+def _session_class(mode, threshold=2):
+    class DetectingSession(Session):
+        pass
+
+    metrics.install_lazy_load_detector(DetectingSession, mode, threshold)
+    return DetectingSession
+
+
+def _lazy_load_children(db):
+    for parent in db.execute(select(Parent)).scalars():
+        parent.children
+
+
+def test_lazy_loads_in_a_loop_trip_the_detector(engine, stats):
+    with _session_class("raise")(engine) as db:
+        with pytest.raises(metrics.LazyLoadLimitExceeded):
+            _lazy_load_children(db)
+    assert stats.lazy_loads == 3
+
+
+def test_log_mode_warns_once_and_keeps_counting(engine, stats, caplog):
+    with caplog.at_level(logging.WARNING, logger=metrics.__name__):
+        with _session_class("log")(engine) as db:
+            _lazy_load_children(db)
+    assert stats.lazy_loads == 5
+    assert len(caplog.records) == 1
+    assert "3 relationship loads" in caplog.records[0].getMessage()
+
+
+def test_eager_loading_counts_once_per_query(engine, stats):
+    with _session_class("raise")(engine) as db:
+        parents = db.execute(
+            select(Parent).options(selectinload(Parent.children))
+        ).scalars()
+        assert sum(len(parent.children) for parent in parents) == 10
+    assert stats.lazy_loads == 1
+
+
+def test_loads_outside_a_request_are_not_counted(engine):
+    with _session_class("raise")(engine) as db:
+        _lazy_load_children(db)
+
+
+def test_off_installs_nothing_and_unknown_modes_are_rejected(engine, stats):
+    with _session_class("off")(engine) as db:
+        _lazy_load_children(db)
+    assert stats.lazy_loads == 0
+    with pytest.raises(ValueError):
+        _session_class("loud")
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import ledger
+from app.models import Base, group_model
+from app.models.ledger_model import BalanceEntry, GroupMemberBalance, PairBalance
+
+GROUP = 1
+
+
+def _entry(paid_by_id, amount, splits):
+    return ledger.expense_entry(GROUP, paid_by_id, amount, splits)
+
+
+def test_deltas_credit_the_payer_against_each_debtor():
+    pairs, members = ledger.ledger_deltas(
+        added=[_entry(2, 30, [(1, 10), (2, 10), (3, 10)])]
+    )
+    # Pairs are (a, b) with a < b and a positive amount meaning a owes b.
+    assert pairs == {(GROUP, 1, 2): 10, (GROUP, 2, 3): -10}
+    assert members == {(GROUP, 2): (30, 10), (GROUP, 1): (0, 10), (GROUP, 3): (0, 10)}
+
+
+def test_deltas_of_an_unchanged_entry_cancel_out():
+    entry = _entry(1, 30, [(1, 15), (2, 15)])
+    assert ledger.ledger_deltas(added=[entry], removed=[entry]) == ({}, {})
+
+
+def test_deltas_of_an_update_only_carry_the_difference():
+    old = _entry(1, 30, [(1, 15), (2, 15)])
+    new = _entry(1, 40, [(1, 20), (2, 20)])
+    pairs, members = ledger.ledger_deltas(added=[new], removed=[old])
+    assert pairs == {(GROUP, 1, 2): -5}
+    assert members == {(GROUP, 1): (10, 5), (GROUP, 2): (0, 5)}
+
+
+@pytest.fixture
+def engines(tmp_path):
+    path = tmp_path / "ledger.db"
+    engine = create_engine("sqlite:///%s" % path)
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine("sqlite+aiosqlite:///%s" % path)
+    yield engine, async_engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def _add_expense(db, expense_id, paid_by_id, amount, splits):
+    db.add(
+        group_model.GroupExpense(
+            id=expense_id,
+            group_id=GROUP,
+            name="expense %s" % expense_id,
+            amount_minor=amount,
+            paid_by_id=paid_by_id,
+            splits=[
+                group_model.ExpenseSplit(
+                    group_id=GROUP, user_id=user_id, amount_minor=owed
+                )
+                for user_id, owed in splits
+            ],
+        )
+    )
+    db.commit()
+
+
+def _record(async_engine, monkeypatch, *args, **kwargs):
+    async def run():
+        async with AsyncSession(async_engine) as db:
+            monkeypatch.setattr(ledger, "get_async_session", lambda: db)
+            await ledger.record(*args, **kwargs)
+            await db.commit()
+
+    asyncio.run(run())
+
+
+def test_record_keeps_the_running_tables_in_step_with_the_entries(engines, monkeypatch):
+    engine, async_engine = engines
+    old = _entry(1, 30, [(1, 10), (2, 10), (3, 10)])
+    new = _entry(1, 60, [(1, 20), (2, 40)])
+    _record(async_engine, monkeypatch, 7, added=[old])
+    _record(async_engine, monkeypatch, 7, added=[new], removed=[old])
+    with Session(engine) as db:
+        _add_expense(db, 7, 1, 60, [(1, 20), (2, 40)])
+        entries = db.execute(
+            select(BalanceEntry.user_a_id, BalanceEntry.user_b_id, BalanceEntry.amount)
+        ).all()
+        assert sorted(entries) == [(1, 2, -30), (1, 2, -10), (1, 3, -10), (1, 3, 10)]
+        running = {
+            (row.user_a_id, row.user_b_id): row.balance
+            for row in db.execute(select(PairBalance)).scalars()
+        }
+        assert running == {(1, 2): -40, (1, 3): 0}
+        members = {
+            row.user_id: (row.paid, row.owed)
+            for row in db.execute(select(GroupMemberBalance)).scalars()
+        }
+        assert members == {1: (60, 20), 2: (0, 40), 3: (0, 0)}
+        assert ledger.verify(db) == []
+
+
+def test_repair_appends_corrections_and_rewrites_the_running_tables(engines):
+    engine, _ = engines
+    with Session(engine) as db:
+        _add_expense(db, 7, 1, 30, [(1, 10), (2, 20)])
+        db.add(PairBalance(group_id=GROUP, user_a_id=1, user_b_id=2, balance=-5))
+        db.commit()
+        assert ledger.verify(db)
+
+        assert ledger.repair(db) == 1
+        correction = db.execute(select(BalanceEntry)).scalars().one()
+        assert (correction.amount, correction.group_expense_id) == (-20, None)
+        assert db.execute(select(PairBalance.balance)).scalars().all() == [-20]
+        assert ledger.verify(db) == []
+        assert ledger.repair(db) == 0
@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app import metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram(buckets=(1, 5, 10))
+    for value in (0.5, 3, 3, 7, 50):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == [(1, 1), (5, 3), (10, 4)]
+    assert (snapshot["count"], snapshot["sum"]) == (5, 63.5)
+
+
+@pytest.fixture
+def stats():
+    stats = metrics.RequestStats()
+    token = metrics._request_stats.set(stats)
+    yield stats
+    metrics._request_stats.reset(token)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    metrics.install_query_hooks(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_query_hooks_count_queries_and_time_for_the_request(engine, stats):
+    with engine.connect() as conn:
+        for _ in range(3):
+            conn.execute(text("SELECT 1"))
+    assert stats.queries == 3
+    assert stats.db_seconds > 0
+
+
+def test_failed_queries_are_not_counted(engine, stats):
+    with engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+    assert stats.queries == 1
+
+
+def test_queries_outside_a_request_are_ignored(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert metrics.current_request_stats() is None
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+
+def _app(engine):
+    def item(request):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return PlainTextResponse("ok")
+
+    def broken(request):
+        return PlainTextResponse("no", status_code=503)
+
+    app = Starlette(
+        routes=[Route("/items/{id}", item), Route("/broken", broken)],
+    )
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+def test_middleware_records_requests_by_route_template(engine, registry):
+    client = TestClient(_app(engine))
+    for id in (1, 2):
+        response = client.get("/items/%d" % id)
+        assert response.status_code == 200
+        assert 'desc="2 queries"' in response.headers["server-timing"]
+    client.get("/broken")
+    client.get("/nowhere")
+
+    assert registry.responses == {
+        ("GET", "/items/{id}", 200): 2,
+        ("GET", "/broken", 503): 1,
+        ("GET", "<unmatched>", 404): 1,
+    }
+    assert registry.queries[("GET", "/items/{id}")].snapshot()["sum"] == 4
+    assert registry.latency[("GET", "/items/{id}")].snapshot()["count"] == 2
+
+
+def test_registry_renders_prometheus_text(registry):
+    stats = metrics.RequestStats()
+    stats.queries = 2
+    registry.observe_request("GET", "/items/{id}", 200, 0.02, stats)
+    registry.register_stats(
+        "demo", lambda: {"hits": 3, "size": 1, "name": "x"}, ("hits",)
+    )
+    rendered = registry.render()
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/items/{id}",le="0.025"} 1'
+        in rendered
+    )
+    assert (
+        'http_responses_total{method="GET",route="/items/{id}",status="200"} 1'
+        in rendered
+    )
+    assert "# TYPE demo_hits_total counter\n" in rendered
+    assert "demo_size 1\n" in rendered
+    assert "demo_name" not in rendered
@@ -0,0 +1,48 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+from app import money
+
+
+@pytest.mark.parametrize(
+    "amount, currency, minor",
+    [
+        (12.34, "USD", 1234),
+        (0.1 + 0.2, "USD", 30),
+        ("19.99", "EUR", 1999),
+        (Decimal("1.005"), "USD", 101),
+        (Decimal("-1.005"), "USD", -101),
+        (Decimal("2.5"), "JPY", 3),
+        (1500, "JPY", 1500),
+        (Decimal("1.2345"), "KWD", 1235),
+        (7, None, 700),
+    ],
+)
+def test_to_minor_rounds_half_up_to_the_currency_exponent(amount, currency, minor):
+    assert money.to_minor(amount, currency) == minor
+
+
+@pytest.mark.parametrize(
+    "minor, currency, amount",
+    [
+        (1234, "USD", Decimal("12.34")),
+        (-5, "USD", Decimal("-0.05")),
+        (1500, "JPY", Decimal("1500")),
+        (1235, "KWD", Decimal("1.235")),
+        (None, "USD", Decimal("0")),
+    ],
+)
+def test_from_minor(minor, currency, amount):
+    assert money.from_minor(minor, currency) == amount
+
+
+@pytest.mark.parametrize("currency", ["USD", "JPY", "KWD"])
+@pytest.mark.parametrize("amount", ["0", "0.01", "12.34", "99999.99", "-42.5"])
+def test_round_trip(amount, currency):
+    amount = Decimal(amount)
+    minor = money.to_minor(amount, currency)
+    assert money.from_minor(minor, currency) == amount.quantize(
+        Decimal(1).scaleb(-money.exponent(currency)), ROUND_HALF_UP
+    )
+    assert money.to_float(minor, currency) == float(money.from_minor(minor, currency))
@@ -0,0 +1,122 @@
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi_jwt_auth import AuthJWT
+from fastapi_jwt_auth.exceptions import (
+    AuthJWTException,
+    JWTDecodeError,
+    MissingTokenError,
+)
+from starlette.requests import Request
+
+from app import oauth2
+
+
+@pytest.fixture(scope="module")
+def rsa_keys():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public = (
+        key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+    return private, public
+
+
+@pytest.fixture(autouse=True)
+def configured(monkeypatch, rsa_keys):
+    private, public = rsa_keys
+    monkeypatch.setattr(AuthJWT, "_private_key", private)
+    monkeypatch.setattr(AuthJWT, "_public_key", public)
+    oauth2.token_cache.clear()
+    yield
+    oauth2.token_cache.clear()
+
+
+def _request(token=None):
+    headers = []
+    if token is not None:
+        headers.append((b"authorization", ("Bearer %s" % token).encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def _encode(claims, rsa_keys, algorithm="RS256"):
+    payload = {"type": "access", "exp": int(time.time()) + 60, **claims}
+    # PyJWT 1.x returns bytes.
+    return jwt.encode(payload, rsa_keys[0], algorithm=algorithm).decode()
+
+
+def test_valid_token_returns_claims(rsa_keys):
+    token = AuthJWT().create_access_token(subject="7")
+    assert oauth2.verify_request_token(_request(token))["sub"] == "7"
+
+
+def test_missing_token_is_reported():
+    with pytest.raises(MissingTokenError):
+        oauth2.verify_request_token(_request())
+
+
+def test_symmetric_algorithm_is_a_decode_error():
+    token = jwt.encode(
+        {"sub": "7", "type": "access", "exp": int(time.time()) + 60},
+        "not-the-key",
+        algorithm="HS256",
+    ).decode()
+    with pytest.raises(JWTDecodeError):
+        oauth2.verify_request_token(_request(token))
+
+
+def test_expired_token_is_a_decode_error(rsa_keys):
+    token = _encode({"sub": "7", "exp": int(time.time()) - 60}, rsa_keys)
+    with pytest.raises(JWTDecodeError):
+        oauth2.verify_request_token(_request(token))
+    assert len(oauth2.token_cache) == 0
+
+
+@pytest.mark.parametrize("claims", [{}, {"sub": "alice"}, {"sub": None}])
+def test_token_without_integer_subject_is_a_decode_error(claims, rsa_keys):
+    token = _encode(claims, rsa_keys)
+    with pytest.raises(JWTDecodeError):
+        oauth2.verify_request_token(_request(token))
+    assert len(oauth2.token_cache) == 0
+
+
+def test_decoded_claims_are_cached_by_token(monkeypatch):
+    token = AuthJWT().create_access_token(subject="7")
+    first = oauth2.decode_access_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("token decoded twice")
+
+    monkeypatch.setattr(AuthJWT, "_verified_token", fail)
+    assert oauth2.decode_access_token(token) is first
+    assert oauth2.verify_request_token(_request(token))["sub"] == "7"
+
+
+def test_outcome_is_kept_on_the_request(monkeypatch):
+    request = _request("garbage")
+    with pytest.raises(AuthJWTException) as first:
+        oauth2.verify_request_token(request)
+    monkeypatch.setattr(oauth2, "decode_access_token", lambda token: {"sub": "7"})
+    with pytest.raises(AuthJWTException) as second:
+        oauth2.verify_request_token(request)
+    assert second.value is first.value
+
+
+def test_require_user_rejects_bad_tokens_with_401(rsa_keys):
+    token = _encode({}, rsa_keys)
+    with pytest.raises(HTTPException) as e:
+        oauth2.require_user(_request(token))
+    assert e.value.status_code == 401
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import rates, recurrence, rollups
+from app.models import Base
+from app.models.expense_model import Expense, User
+from app.models.recurrence_model import RecurrenceRule
+from app.recurrence import _due_occurrences, align, idempotency_key, occurrence
+
+
+def test_monthly_clamps_month_ends_without_drifting():
+    start = datetime(2023, 1, 31, 9, 0)
+    assert [occurrence(start, "monthly", 1, i) for i in range(5)] == [
+        datetime(2023, 1, 31, 9, 0),
+        datetime(2023, 2, 28, 9, 0),
+        datetime(2023, 3, 31, 9, 0),
+        datetime(2023, 4, 30, 9, 0),
+        datetime(2023, 5, 31, 9, 0),
+    ]
+
+
+def test_monthly_uses_leap_february():
+    assert occurrence(datetime(2024, 1, 30), "monthly", 1, 1) == datetime(2024, 2, 29)
+
+
+def test_monthly_interval_crosses_years():
+    assert occurrence(datetime(2023, 11, 15), "monthly", 3, 2) == datetime(2024, 5, 15)
+
+
+def test_yearly_leap_day_falls_back_to_feb_28():
+    start = datetime(2024, 2, 29, tzinfo=timezone.utc)
+    assert [occurrence(start, "yearly", 1, i) for i in range(5)] == [
+        datetime(2024, 2, 29, tzinfo=timezone.utc),
+        datetime(2025, 2, 28, tzinfo=timezone.utc),
+        datetime(2026, 2, 28, tzinfo=timezone.utc),
+        datetime(2027, 2, 28, tzinfo=timezone.utc),
+        datetime(2028, 2, 29, tzinfo=timezone.utc),
+    ]
+
+
+@pytest.mark.parametrize(
+    "frequency, interval, index, expected",
+    [
+        ("daily", 1, 1, datetime(2024, 3, 1)),
+        ("daily", 3, 2, datetime(2024, 3, 6)),
+        ("weekly", 2, 1, datetime(2024, 3, 14)),
+    ],
+)
+def test_daily_and_weekly(frequency, interval, index, expected):
+    start = datetime(2024, 2, 29)
+    assert occurrence(start, frequency, interval, index) == expected
+
+
+def test_unknown_frequency_is_rejected():
+    with pytest.raises(ValueError):
+        occurrence(datetime(2024, 1, 1), "hourly", 1, 1)
+
+
+def test_idempotency_key_is_per_rule_and_occurrence():
+    assert idempotency_key(7, 3) == "recurrence:7:3"
+    assert idempotency_key(7, 3) != idempotency_key(73, 0)
+
+
+def test_align_matches_the_zone_awareness_of_like():
+    aware = datetime(2024, 1, 1, 2, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert align(aware, datetime(2024, 1, 1)) == datetime(2024, 1, 1, 0, 0)
+    assert align(datetime(2024, 1, 1), aware) == datetime(
+        2024, 1, 1, tzinfo=timezone.utc
+    )
+
+
+def _rule(starts_at, **kwargs):
+    fields = dict(
+        starts_at=starts_at,
+        frequency="monthly",
+        interval=1,
+        occurrences=1,
+        next_run_at=occurrence(starts_at, "monthly", 1, 1),
+        ends_at=None,
+    )
+    fields.update(kwargs)
+    return SimpleNamespace(**fields)
+
+
+def test_due_occurrences_catch_up_until_now():
+    now = datetime.now(timezone.utc)
+    rule = _rule(now - timedelta(days=100), frequency="daily")
+    rule.next_run_at = occurrence(rule.starts_at, "daily", 1, 1)
+    due = _due_occurrences(rule, limit=1000)
+    assert [index for index, _ in due] == list(range(1, 101))
+    assert all(when <= now for _, when in due)
+
+
+def test_due_occurrences_respect_limit_and_ends_at():
+    start = datetime(2020, 1, 31)
+    assert len(_due_occurrences(_rule(start), limit=5)) == 5
+    due = _due_occurrences(_rule(start, ends_at=datetime(2020, 4, 30)), limit=100)
+    assert [when for _, when in due] == [
+        datetime(2020, 2, 29),
+        datetime(2020, 3, 31),
+        datetime(2020, 4, 30),
+    ]
+
+
+def test_due_occurrences_keep_their_dates_after_a_retry():
+    start = datetime(2020, 1, 31)
+    rule = _rule(start, next_run_at=datetime(2020, 6, 1, 12, 0))
+    assert _due_occurrences(rule, limit=2) == [
+        (1, datetime(2020, 2, 29)),
+        (2, datetime(2020, 3, 31)),
+    ]
+
+
+@pytest.fixture
+def engines(tmp_path):
+    path = tmp_path / "recurrence.db"
+    engine = create_engine("sqlite:///%s" % path)
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine("sqlite+aiosqlite:///%s" % path)
+    yield engine, async_engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def _add_rule(db, rule_id, currency, starts_at):
+    template = Expense(
+        name="rent", amount_minor=100, currency=currency, created_by_id=1
+    )
+    db.add(template)
+    db.flush()
+    db.add(
+        RecurrenceRule(
+            id=rule_id,
+            template_expense_id=template.id,
+            frequency="daily",
+            starts_at=starts_at,
+            next_run_at=occurrence(starts_at, "daily", 1, 1),
+            created_by_id=1,
+        )
+    )
+
+
+def _materialize(async_engine, monkeypatch, batch_size):
+    async def run():
+        async with AsyncSession(async_engine) as db:
+            monkeypatch.setattr(recurrence, "get_async_session", lambda: db)
+            monkeypatch.setattr(rollups, "get_async_session", lambda: db)
+            return await recurrence.materialize_due(batch_size)
+
+    return asyncio.run(run())
+
+
+def test_rules_missing_a_rate_back_off_instead_of_blocking_the_batch(
+    engines, monkeypatch
+):
+    engine, async_engine = engines
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        db.add(User(id=1, email="a@b.com", base_currency="USD"))
+        _add_rule(db, 1, "EUR", now - timedelta(days=3, hours=1))
+        _add_rule(db, 2, "USD", now - timedelta(days=1, hours=1))
+        db.commit()
+
+    async def rate(source, target, on=None):
+        if source != target:
+            raise rates.MissingRate(source, target, on)
+        return 1
+
+    monkeypatch.setattr(rates.rate_cache, "rate", rate)
+    assert _materialize(async_engine, monkeypatch, batch_size=1) == 0
+    assert _materialize(async_engine, monkeypatch, batch_size=1) == 1
+
+    with Session(engine) as db:
+        stuck, other = db.execute(
+            select(RecurrenceRule).order_by(RecurrenceRule.id)
+        ).scalars()
+        assert stuck.occurrences == 1
+        assert align(stuck.next_run_at, now) > now
+        assert other.occurrences == 2
+        keys = db.execute(
+            select(Expense.idempotency_key).where(Expense.idempotency_key.is_not(None))
+        ).scalars()
+        assert keys.all() == ["recurrence:2:1"]
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette_context import request_cycle_context
+
+from app import cache, mixins
+from app.cache import MemoryBackend, ResponseCache
+
+
+def _request(path="/api/expense/", query="", etag=None, user_id=1):
+    headers = [(b"host", b"testserver")]
+    if etag is not None:
+        headers.append((b"if-none-match", etag.encode()))
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": headers,
+        }
+    )
+    request.state.user_id = user_id
+    return request
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    fresh = ResponseCache(MemoryBackend(maxsize=16, ttl=60), ttl=60)
+    monkeypatch.setattr(cache, "response_cache", fresh)
+    monkeypatch.setattr(mixins, "response_cache", fresh)
+    return fresh
+
+
+def test_version_is_stable_until_bumped(response_cache):
+    version = response_cache.version(1)
+    assert response_cache.version(1) == version
+    response_cache.bump(1)
+    assert response_cache.version(1) != version
+
+
+def test_versions_are_per_user(response_cache):
+    other = response_cache.version(2)
+    response_cache.bump(1)
+    assert response_cache.version(2) == other
+
+
+def test_a_lost_counter_restarts_from_the_clock(response_cache):
+    # incr on a missing counter returns 1, which older entries may be keyed on.
+    response_cache.bump(1)
+    assert int(response_cache.version(1)) > 1
+
+
+def test_writes_bump_the_version_of_the_requesting_user(response_cache):
+    versions = {1: response_cache.version(1), 2: response_cache.version(2)}
+    with request_cycle_context({"user_id": 1}):
+        mixins._bump_cache_version()
+    assert response_cache.version(1) != versions[1]
+    assert response_cache.version(2) == versions[2]
+
+
+def test_key_ignores_query_order_and_follows_the_version(response_cache):
+    key = response_cache.key(1, _request(query="b=2&a=1"))
+    assert response_cache.key(1, _request(query="a=1&b=2")) == key
+    assert response_cache.key(2, _request(query="a=1&b=2")) != key
+    response_cache.bump(1)
+    assert response_cache.key(1, _request(query="a=1&b=2")) != key
+
+
+def test_stored_entry_revalidates_with_its_etag(response_cache):
+    key = response_cache.key(1, _request())
+    assert response_cache.get(key) is None
+    meta, _ = response_cache.store(key, Response(b"[1]", media_type="application/json"))
+    entry = response_cache.get(key)
+
+    response = ResponseCache.respond(entry, _request())
+    assert response.status_code == 200
+    assert response.body == b"[1]"
+    assert response.headers["etag"] == meta["etag"]
+
+    not_modified = ResponseCache.respond(entry, _request(etag=meta["etag"]))
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert ResponseCache.respond(entry, _request(etag='"stale"')).status_code == 200
+
+
+def test_cached_response_serves_repeats_until_a_write_bumps_the_version(
+    response_cache,
+):
+    calls = []
+
+    @cache.cached_response
+    async def endpoint(request):
+        calls.append(request)
+        return {"calls": len(calls)}
+
+    first = asyncio.run(endpoint(request=_request()))
+    again = asyncio.run(endpoint(request=_request()))
+    assert len(calls) == 1
+    assert again.body == first.body
+    revalidated = asyncio.run(endpoint(request=_request(etag=first.headers["etag"])))
+    assert revalidated.status_code == 304
+
+    response_cache.bump(1)
+    after_write = asyncio.run(endpoint(request=_request(etag=first.headers["etag"])))
+    assert len(calls) == 2
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != first.headers["etag"]
+
+
+def test_cached_response_passes_errors_and_streams_through(response_cache):
+    @cache.cached_response
+    async def failing(request):
+        return Response(b"nope", status_code=404)
+
+    @cache.cached_response
+    async def streaming(request):
+        return StreamingResponse(iter([b"x"]))
+
+    for endpoint in (failing, streaming):
+        asyncio.run(endpoint(request=_request()))
+        response = asyncio.run(endpoint(request=_request()))
+        assert "etag" not in response.headers
+    assert response_cache.stats()["size"] == 0
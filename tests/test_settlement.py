@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+import pytest
+
+from app.settlement import split_amount, settle
+
+
+def test_equal_split_hands_leftover_cents_to_the_first_members():
+    assert split_amount(100, "equal", [1, 2, 3]) == [
+        (1, 3334),
+        (2, 3333),
+        (3, 3333),
+    ]
+
+
+@pytest.mark.parametrize("amount", [0.01, 0.05, 10, 99.99, 1234.57])
+@pytest.mark.parametrize("members", [1, 3, 7])
+def test_equal_split_adds_up_to_the_amount(amount, members):
+    owed = split_amount(amount, "equal", list(range(members)))
+    cents = [value for _, value in owed]
+    assert sum(cents) == round(amount * 100)
+    assert max(cents) - min(cents) <= 1
+
+
+def test_percentage_split_uses_largest_remainders():
+    # 333.3, 333.3 and 333.4 cents: the leftover cent goes to the largest fraction.
+    assert split_amount(10, "percentage", [1, 2, 3], [33.33, 33.33, 33.34]) == [
+        (1, 333),
+        (2, 333),
+        (3, 334),
+    ]
+    owed = split_amount(0.1, "percentage", [1, 2, 3], [50, 25, 25])
+    assert sum(value for _, value in owed) == 10
+
+
+def test_split_in_a_zero_decimal_currency():
+    assert split_amount(1000, "equal", [1, 2, 3], currency="JPY") == [
+        (1, 334),
+        (2, 333),
+        (3, 333),
+    ]
+
+
+@pytest.mark.parametrize(
+    "shares",
+    [None, [50, None], [60, 50], [50, 49.99], [150, -50]],
+)
+def test_invalid_percentages_are_rejected(shares):
+    with pytest.raises(ValueError):
+        split_amount(10, "percentage", [1, 2], shares)
+
+
+def test_exact_split_must_match_the_amount():
+    assert split_amount(10, "exact", [1, 2], [2.5, 7.5]) == [(1, 250), (2, 750)]
+    with pytest.raises(ValueError):
+        split_amount(10, "exact", [1, 2], [2.5, 7.49])
+
+
+@pytest.mark.parametrize(
+    "user_ids, split_type",
+    [([], "equal"), ([1, 1], "equal"), ([1, 2], "thirds")],
+)
+def test_bad_splits_are_rejected(user_ids, split_type):
+    with pytest.raises(ValueError):
+        split_amount(10, split_type, user_ids)
+
+
+def _apply(balances, transfers):
+    cents = defaultdict(int, balances)
+    for debtor, creditor, amount in transfers:
+        assert amount > 0
+        cents[debtor] += amount
+        cents[creditor] -= amount
+    return cents
+
+
+def test_settle_clears_every_balance_in_at_most_n_minus_1_transfers():
+    balances = {1: 6000, 2: -1000, 3: -2550, 4: 550, 5: -3000}
+    transfers = settle(balances)
+    assert len(transfers) <= len(balances) - 1
+    assert not any(_apply(balances, transfers).values())
+
+
+def test_settle_pairs_the_largest_debtor_with_the_largest_creditor():
+    assert settle({1: 3000, 2: -3000, 3: 1000, 4: -1000}) == [
+        (2, 1, 3000),
+        (4, 3, 1000),
+    ]
+
+
+def test_settle_single_creditor_needs_one_transfer_per_debtor():
+    transfers = settle({1: 600, 2: -100, 3: -200, 4: -300})
+    assert sorted(transfers) == [(2, 1, 100), (3, 1, 200), (4, 1, 300)]
+
+
+def test_settle_ignores_settled_members():
+    assert settle({1: 500, 2: 0, 3: -500}) == [(3, 1, 500)]
+    assert settle({1: 0, 2: 0}) == []